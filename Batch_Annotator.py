@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Burns the reticle, computed drop, range and temperatures into recorded footage.
+
+Usage:
+    python Batch_Annotator.py session.mp4 session_sensors.csv annotated.mp4 --workers 4
+
+The sensor log is the CSV written by Smart_Scope when SENSOR_LOG_PATH is set.
+The video is split into chunks of frames that a process pool annotates in
+parallel with the same ScopeOverlay and ballistic code as the live scope. The
+chunks are then stitched together, with ffmpeg if it is installed. Raw streams
+without a frame index, such as picamera .h264, are first copied into an MP4 with
+ffmpeg so the chunks can seek, or annotated in a single pass without ffmpeg.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from Sensor_Log import SensorLog
+
+# Per worker process state, built once by _init_worker
+worker = {}
+
+def _init_worker(log_path, width, height):
+    from better_PiCamera import ScopeOverlay
+    import Smart_Scope
+
+    scope = ScopeOverlay(width=width, height=height)
+    scope.set_holdover_table(Smart_Scope.buildHoldoverTable())
+    worker['scope'] = scope
+    worker['log'] = SensorLog(log_path)
+    worker['drop'] = Smart_Scope.calculateVertDrop
+
+def checkHoldPoint(width, height, distance=10.0):
+    """Checks that the overlay at the video's size holds where calculateVertTranslation says.
+
+    The holdover table is built for a 480 px image and ScopeOverlay rescales it to
+    its own height. A mismatch would burn a wrong hold into every frame.
+    """
+    from better_PiCamera import ScopeOverlay
+    import Smart_Scope
+
+    scope = ScopeOverlay(width=width, height=height)
+    scope.set_holdover_table(Smart_Scope.buildHoldoverTable())
+    scope.update_sensor_data({'Range': f'{distance}m', 'Wind': '0m/s'})
+    scope._apply_holdover()
+    expected = Smart_Scope.calculateVertTranslation(distance, height)
+    if abs(scope.crosshair_y - expected) > 1:
+        raise SystemExit(f'[FATAL ERROR] Hold point at {distance} m is y={scope.crosshair_y}, '
+                         f'expected {expected:.1f} for a {width}x{height} video')
+    return scope.crosshair_y
+
+def _annotate_chunk(video_path, output_path, start_frame, end_frame, fps, video_start):
+    """Annotates frames [start_frame, end_frame) into output_path, to the end if end_frame is None.
+
+    Returns (frames, seconds).
+    """
+    started = time.perf_counter()
+    scope = worker['scope']
+    log = worker['log']
+
+    capture = cv2.VideoCapture(video_path)
+    if start_frame:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        if int(capture.get(cv2.CAP_PROP_POS_FRAMES)) != start_frame:
+            capture.release()
+            raise RuntimeError(f'Could not seek to frame {start_frame} of {video_path}')
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (scope.width, scope.height))
+
+    frames = 0
+    index = start_frame
+    while end_frame is None or index < end_frame:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        if frame.shape[1] != scope.width or frame.shape[0] != scope.height:
+            frame = cv2.resize(frame, (scope.width, scope.height))
+
+        timestamp = video_start + index / fps
+        readings = log.at(timestamp)
+        distance_cm = readings.get('estimated_distance_cm', readings.get('distance_cm', 0))
+        distance_m = distance_cm / 100
+
+        scope.update_sensor_data({
+            'Range': f'{distance_m:.2f}m',
+            'Drop': f'{worker["drop"](distance_m):.1f}cm',
+            'Wind': f'{readings.get("crosswind_mps", 0):.1f}m/s',
+            'LIDAR': f'{readings.get("lidar_temp_celsius", 0):.0f}C',
+            'CPU': f'{readings.get("cpu_temp_celsius", 0):.0f}C',
+            'Time': time.strftime('%H:%M:%S', time.localtime(timestamp)),
+        })
+        scope.frame = frame
+        scope.frame_timestamp = timestamp
+        writer.write(scope.get_frame_with_overlay())
+        frames += 1
+        index += 1
+
+    capture.release()
+    writer.release()
+    return frames, time.perf_counter() - started
+
+def remuxForSeeking(video_path, temp_dir, fps):
+    """Copies a raw stream such as picamera .h264 into an MP4 so chunks can seek.
+
+    The video is not re-encoded. Returns (path, frame count), or (None, 0) if
+    ffmpeg is not installed or the remux failed.
+    """
+    if not shutil.which('ffmpeg'):
+        return None, 0
+    remuxed = os.path.join(temp_dir, 'remuxed.mp4')
+    # Raw streams carry no timestamps, -framerate gives the frames their times
+    result = subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-framerate', f'{fps:g}',
+                             '-i', video_path, '-c', 'copy', remuxed])
+    if result.returncode != 0:
+        return None, 0
+    capture = cv2.VideoCapture(remuxed)
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    if total <= 0:
+        return None, 0
+    return remuxed, total
+
+def stitchChunks(chunk_paths, output_path, fps, size):
+    """Joins the chunk files, stream copy with ffmpeg when available, otherwise re-encoding with OpenCV"""
+    if shutil.which('ffmpeg'):
+        list_path = output_path + '.chunks.txt'
+        with open(list_path, 'wt') as f:
+            for path in chunk_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        result = subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                                 '-i', list_path, '-c', 'copy', output_path])
+        os.remove(list_path)
+        if result.returncode == 0:
+            return
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    for path in chunk_paths:
+        capture = cv2.VideoCapture(path)
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            writer.write(frame)
+        capture.release()
+    writer.release()
+
+def main():
+    parser = argparse.ArgumentParser(description='Annotate recorded video with the scope overlay.')
+    parser.add_argument('video')
+    parser.add_argument('sensor_log')
+    parser.add_argument('output')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-frames', type=int, default=300)
+    parser.add_argument('--video-start', type=float,
+                        help='time.time() of the first video frame (default: start of the sensor log)')
+    parser.add_argument('--offset', type=float, default=0.0, help='seconds added to the video start')
+    args = parser.parse_args()
+
+    capture = cv2.VideoCapture(args.video)
+    if not capture.isOpened():
+        raise SystemExit(f'[FATAL ERROR] Could not open {args.video}')
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+
+    holdY = checkHoldPoint(width, height)
+    print(f'[info] Hold point at 10 m: y={holdY} px on {width}x{height}')
+
+    video_start = args.video_start if args.video_start is not None else SensorLog(args.sensor_log).start
+    video_start += args.offset
+
+    started = time.perf_counter()
+    temp_dir = tempfile.mkdtemp(prefix='annotate_')
+    try:
+        video = args.video
+        workers = args.workers
+        if total <= 0:
+            # No frame count means the container can't seek, e.g. raw picamera .h264
+            remuxed, total = remuxForSeeking(args.video, temp_dir, fps)
+            if remuxed is not None:
+                video = remuxed
+                print(f'[info] {args.video} has no frame index, remuxed it with ffmpeg for seeking')
+            else:
+                workers = 1
+                print(f'[WARNING] {args.video} has no frame index and could not be remuxed with ffmpeg, '
+                      f'annotating in a single pass on one worker')
+
+        if total > 0:
+            chunks = [(start, min(start + args.chunk_frames, total))
+                      for start in range(0, total, args.chunk_frames)]
+            print(f'[info] {total} frames at {fps:.1f} fps in {len(chunks)} chunks on {workers} workers')
+        else:
+            chunks = [(0, None)]
+
+        chunk_paths = [os.path.join(temp_dir, f'chunk_{i:05d}.mp4') for i in range(len(chunks))]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(args.sensor_log, width, height)) as pool:
+            futures = [pool.submit(_annotate_chunk, video, path, start, end, fps, video_start)
+                       for path, (start, end) in zip(chunk_paths, chunks)]
+            results = [future.result() for future in futures]
+        annotated = time.perf_counter() - started
+        if sum(r[0] for r in results) == 0:
+            raise SystemExit(f'[FATAL ERROR] No frames could be decoded from {args.video}')
+
+        stitchChunks(chunk_paths, args.output, fps, (width, height))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    frames = sum(r[0] for r in results)
+    busy = max(sum(r[1] for r in results), 1e-6)
+    print(f'[info] Annotated {frames} frames in {elapsed:.1f} s ({annotated:.1f} s annotating, '
+          f'{elapsed - annotated:.1f} s stitching)')
+    print(f'[info] Throughput {frames / elapsed:.1f} fps overall, {frames / elapsed / workers:.1f} fps per core, '
+          f'{frames / busy:.1f} fps per busy core, {frames / elapsed / fps:.2f}x real time')
+
+if __name__ == "__main__":
+    main()
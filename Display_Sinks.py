@@ -0,0 +1,259 @@
+import mmap
+import os
+import queue
+import select
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+class DisplaySink:
+    """Where rendered frames go. show() takes a BGR frame, poll_key() returns a key code or None."""
+
+    def show(self, frame):
+        raise NotImplementedError
+
+    def poll_key(self):
+        return None
+
+    def close(self):
+        pass
+
+class OpenCVWindowSink(DisplaySink):
+    """cv2.imshow in a desktop window, HighGUI only processes events inside waitKey"""
+
+    def __init__(self, name="Scope View"):
+        self.name = name
+        self.key = None
+        cv2.namedWindow(self.name, cv2.WINDOW_NORMAL)
+
+    def show(self, frame):
+        cv2.imshow(self.name, frame)
+        key = cv2.waitKey(1)
+        if key != -1:
+            self.key = key & 0xFF
+
+    def poll_key(self):
+        key, self.key = self.key, None
+        return key
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+class NullSink(DisplaySink):
+    """Discards frames, for measuring the render loop without any display cost"""
+
+    def __init__(self):
+        self.frames = 0
+        self.started_at = time.monotonic()
+
+    def show(self, frame):
+        self.frames += 1
+
+    def fps(self):
+        return self.frames / max(time.monotonic() - self.started_at, 1e-6)
+
+class FramebufferSink(DisplaySink):
+    """Writes frames straight into a Linux framebuffer such as /dev/fb0, no desktop needed.
+
+    The geometry is read from /sys/class/graphics/<fb> unless it is given. The
+    framebuffer is mmapped once and each frame is converted from BGR to the
+    framebuffer pixel layout in a single cvtColor, directly into the mapping when
+    the frame fills the screen. Frames of another size are letterboxed.
+    """
+
+    CONVERSIONS = {16: cv2.COLOR_BGR2BGR565, 24: None, 32: cv2.COLOR_BGR2BGRA}
+
+    def __init__(self, device='/dev/fb0', width=None, height=None, bits_per_pixel=None, stride=None):
+        if width is None or height is None or bits_per_pixel is None:
+            width, height, bits_per_pixel, stride = self._read_geometry(device)
+        if bits_per_pixel not in self.CONVERSIONS:
+            raise ValueError(f'Unsupported framebuffer depth: {bits_per_pixel} bpp')
+        bytes_per_pixel = bits_per_pixel // 8
+        self.width = width
+        self.height = height
+        self.bits_per_pixel = bits_per_pixel
+        self.stride = stride or width * bytes_per_pixel
+        self.conversion = self.CONVERSIONS[bits_per_pixel]
+
+        self.fd = os.open(device, os.O_RDWR)
+        self.map = mmap.mmap(self.fd, self.stride * height, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        # RGB565 is two uint8 channels, the layout cvtColor produces for COLOR_BGR2BGR565
+        rows = np.frombuffer(self.map, dtype=np.uint8).reshape(height, self.stride)[:, :width * bytes_per_pixel]
+        self.pixels = rows.reshape(height, width, bytes_per_pixel)
+        self.contiguous = self.stride == width * bytes_per_pixel
+        self.layout = None
+
+    def _read_geometry(self, device):
+        sysfs = os.path.join('/sys/class/graphics', os.path.basename(device))
+        with open(os.path.join(sysfs, 'virtual_size'), 'rt') as f:
+            width, height = [int(v) for v in f.read().strip().split(',')]
+        with open(os.path.join(sysfs, 'bits_per_pixel'), 'rt') as f:
+            bits_per_pixel = int(f.read())
+        with open(os.path.join(sysfs, 'stride'), 'rt') as f:
+            stride = int(f.read())
+        return width, height, bits_per_pixel, stride
+
+    def _fit(self, size):
+        """Destination rectangle for frames of this size, computed once per input size"""
+        if self.layout is None or self.layout[0] != size:
+            w, h = size
+            scale = min(self.width / w, self.height / h)
+            tw = int(w * scale)
+            th = int(h * scale)
+            x = (self.width - tw) // 2
+            y = (self.height - th) // 2
+            self.pixels[:] = 0
+            self.layout = (size, (x, y, tw, th))
+        return self.layout[1]
+
+    def show(self, frame):
+        x, y, w, h = self._fit((frame.shape[1], frame.shape[0]))
+        if (w, h) != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+
+        target = self.pixels[y:y + h, x:x + w]
+        if self.conversion is None:
+            target[:] = frame
+        elif self.contiguous and (w, h) == (self.width, self.height):
+            converted = cv2.cvtColor(frame, self.conversion, dst=self.pixels)
+            if not np.shares_memory(converted, self.pixels):
+                self.pixels[:] = converted
+        else:
+            target[:] = cv2.cvtColor(frame, self.conversion)
+
+    def close(self):
+        del self.pixels
+        self.map.close()
+        os.close(self.fd)
+
+class FileFramebuffer:
+    """A plain file standing in for /dev/fb0, for testing FramebufferSink without a display"""
+
+    def __init__(self, path, width=640, height=480, bits_per_pixel=16, stride=None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.bits_per_pixel = bits_per_pixel
+        self.stride = stride or width * bits_per_pixel // 8
+        with open(path, 'wb') as f:
+            f.truncate(self.stride * height)
+
+    def sink(self):
+        return FramebufferSink(self.path, self.width, self.height, self.bits_per_pixel, self.stride)
+
+    def read_bgr(self):
+        """Read the 'screen' back as a BGR image"""
+        bytes_per_pixel = self.bits_per_pixel // 8
+        rows = np.fromfile(self.path, dtype=np.uint8).reshape(self.height, self.stride)
+        data = rows[:, :self.width * bytes_per_pixel].reshape(self.height, self.width, bytes_per_pixel)
+        if self.bits_per_pixel == 16:
+            return cv2.cvtColor(data, cv2.COLOR_BGR5652BGR)
+        if self.bits_per_pixel == 32:
+            return cv2.cvtColor(data, cv2.COLOR_BGRA2BGR)
+        return data.copy()
+
+class KeyReader:
+    """Reads single key presses from the terminal in a background thread.
+
+    Key handling no longer depends on the render loop calling cv2.waitKey, and
+    works over SSH or on the console with a framebuffer sink. poll() never blocks.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdin
+        self.keys = queue.Queue()
+        self.running = False
+        self.saved_attributes = None
+        if self.stream.isatty():
+            import termios
+            import tty
+            self.fd = self.stream.fileno()
+            self.saved_attributes = termios.tcgetattr(self.fd)
+            tty.setcbreak(self.fd)
+            self.running = True
+            self.thread = threading.Thread(target=self._read_keys)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _read_keys(self):
+        while self.running:
+            readable, _, _ = select.select([self.fd], [], [], 0.1)
+            if readable:
+                for key in os.read(self.fd, 32):
+                    self.keys.put(key)
+
+    def poll(self):
+        try:
+            return self.keys.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.running = False
+        if self.saved_attributes is not None:
+            import termios
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved_attributes)
+            self.saved_attributes = None
+
+def createSink(name='window'):
+    """'window', 'null', or a framebuffer device such as 'fb' or '/dev/fb1'"""
+    if name == 'window':
+        return OpenCVWindowSink()
+    if name == 'null':
+        return NullSink()
+    if name == 'fb':
+        return FramebufferSink()
+    if name.startswith('/dev/fb'):
+        return FramebufferSink(name)
+    raise ValueError(f'Unknown display sink: {name}')
+
+# Round trips frames through FramebufferSink into a file standing in for /dev/fb0
+if __name__ == "__main__":
+    import tempfile
+
+    def expected_on_screen(frame, bits_per_pixel):
+        """What the framebuffer should hold, after the lossy RGB565 packing at 16 bpp"""
+        if bits_per_pixel == 16:
+            return cv2.cvtColor(cv2.cvtColor(frame, cv2.COLOR_BGR2BGR565), cv2.COLOR_BGR5652BGR)
+        return frame
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    cases = [
+        ('16 bpp', dict(bits_per_pixel=16)),
+        ('24 bpp', dict(bits_per_pixel=24)),
+        ('32 bpp', dict(bits_per_pixel=32)),
+        ('32 bpp padded stride', dict(bits_per_pixel=32, stride=640 * 4 + 256)),
+        ('16 bpp padded stride', dict(bits_per_pixel=16, stride=640 * 2 + 64)),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fb0')
+        for name, options in cases:
+            fb = FileFramebuffer(path, 640, 480, **options)
+            sink = fb.sink()
+            for _ in range(2): # The second frame takes the cached layout
+                sink.show(frame)
+            sink.close()
+            assert np.array_equal(fb.read_bgr(), expected_on_screen(frame, fb.bits_per_pixel)), name
+            print(f'[info] {name}: frame round trips')
+
+        # A 4:3 frame on a 16:9 screen is centred with black bars left and right
+        fb = FileFramebuffer(path, 854, 480, bits_per_pixel=32)
+        sink = fb.sink()
+        sink.show(frame)
+        sink.close()
+        expected = np.zeros((480, 854, 3), dtype=np.uint8)
+        expected[:, 107:107 + 640] = frame
+        assert np.array_equal(fb.read_bgr(), expected), 'letterbox'
+
+        # Half the size in each direction is scaled up to fill the height
+        fb = FileFramebuffer(path, 640, 480, bits_per_pixel=24)
+        sink = fb.sink()
+        small = cv2.resize(frame, (320, 240), interpolation=cv2.INTER_AREA)
+        sink.show(small)
+        sink.close()
+        assert np.array_equal(fb.read_bgr(), cv2.resize(small, (640, 480), interpolation=cv2.INTER_AREA)), 'scaled'
+        print('[info] Letterboxed and scaled frames land where expected')
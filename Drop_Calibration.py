@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Fits a drop profile to measured drops, replacing the offline Excel regressions.
+
+Usage:
+    python Drop_Calibration.py measured_orbeeze.csv profiles/orbeeze.json --distance-units ft --drop-units in
+
+The CSV needs a 'distance' and a 'drop' column. The fit is a continuous
+piecewise polynomial (a regression spline with matching value, slope and
+curvature at every knot for the default cubic), solved with NumPy least
+squares. The residuals are printed, and the profile is written as JSON for
+Drop_Profile.DropProfile to load at runtime.
+"""
+
+import argparse
+import csv
+import json
+import time
+
+import numpy as np
+from numpy.polynomial import polynomial as P
+
+from Drop_Profile import DropProfile
+
+DISTANCE_TO_METERS = {'m': 1.0, 'ft': 0.3048, 'yd': 0.9144}
+DROP_TO_CM = {'cm': 1.0, 'mm': 0.1, 'in': 2.54}
+
+def readMeasurements(path, distance_units='m', drop_units='cm'):
+    """Return (distances in meters, drops in centimeters) sorted by distance"""
+    distances = []
+    drops = []
+    with open(path, 'rt', newline='') as f:
+        for row in csv.DictReader(f):
+            distances.append(float(row['distance']) * DISTANCE_TO_METERS[distance_units])
+            drops.append(float(row['drop']) * DROP_TO_CM[drop_units])
+    order = np.argsort(distances)
+    return np.asarray(distances)[order], np.asarray(drops)[order]
+
+def fitDropProfile(distances, drops, knots, degree=3):
+    """Least squares fit of a continuous piecewise polynomial.
+
+    Uses the truncated power basis 1, x, ..., x^d, (x - k)_+^d for every knot k,
+    so each piece joins its neighbours with d - 1 continuous derivatives.
+    Return: (breakpoints, coefficients) in the layout DropProfile expects.
+    """
+    knots = sorted(float(k) for k in knots)
+    for k in knots:
+        if not distances[0] < k < distances[-1]:
+            raise ValueError(f'Knot {k:g} m is outside the measured range {distances[0]:g} to {distances[-1]:g} m')
+    if len(set(knots)) != len(knots):
+        raise ValueError('Knots must be distinct')
+    if len(distances) <= degree + 1 + len(knots):
+        raise ValueError('Not enough measurements for this many knots')
+
+    # Fit in a scaled variable so x^3 at long range does not swamp the normal equations
+    scale = float(np.max(np.abs(distances))) or 1.0
+    t = distances / scale
+    scaled_knots = [k / scale for k in knots]
+
+    columns = [t ** p for p in range(degree + 1)]
+    columns += [np.clip(t - k, 0, None) ** degree for k in scaled_knots]
+    solution, _, _, _ = np.linalg.lstsq(np.column_stack(columns), drops, rcond=None)
+    base = solution[:degree + 1]
+    jumps = solution[degree + 1:]
+
+    breakpoints = [float(distances[0])] + knots + [float(distances[-1])]
+    coefficients = []
+    for i in range(len(breakpoints) - 1):
+        # Polynomial in t that is active on this segment, lowest power first
+        segment = np.array(base)
+        for k, jump in zip(scaled_knots[:i], jumps[:i]):
+            segment = P.polyadd(segment, jump * P.polypow([-k, 1.0], degree))
+        # Re-express it in the local variable u = x - breakpoint, t = (u + breakpoint) / scale
+        local = np.zeros(1)
+        shift = np.array([breakpoints[i] / scale, 1.0 / scale])
+        for c in segment[::-1]:
+            local = P.polyadd(P.polymul(local, shift), [c])
+        local = np.pad(local, (0, degree + 1 - len(local)))
+        coefficients.append([float(c) for c in local[::-1]])
+
+    return breakpoints, coefficients
+
+def reportResiduals(profile, distances, drops):
+    """Print per point residuals and summary statistics, returns the RMS residual in cm"""
+    predicted = profile.evaluate_array(distances)
+    residuals = drops - predicted
+    rms = float(np.sqrt(np.mean(residuals ** 2)))
+    total = float(np.sum((drops - np.mean(drops)) ** 2))
+    r_squared = 1 - float(np.sum(residuals ** 2)) / total if total > 0 else 1.0
+
+    print(f'{"distance (m)":>14}{"measured (cm)":>15}{"fitted (cm)":>13}{"residual":>10}')
+    for d, measured, fitted, r in zip(distances, drops, predicted, residuals):
+        print(f'{d:14.2f}{measured:15.2f}{fitted:13.2f}{r:10.2f}')
+    print(f'[info] RMS residual: {rms:.3f} cm, max: {np.max(np.abs(residuals)):.3f} cm, R^2: {r_squared:.4f}')
+    return rms
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit a drop profile to measured bullet drops.')
+    parser.add_argument('csv', help="measurements with 'distance' and 'drop' columns")
+    parser.add_argument('output', help='profile JSON to write')
+    parser.add_argument('--name', default='', help='caliber name stored in the profile')
+    parser.add_argument('--distance-units', choices=DISTANCE_TO_METERS, default='m')
+    parser.add_argument('--drop-units', choices=DROP_TO_CM, default='cm')
+    parser.add_argument('--degree', type=int, default=3)
+    parser.add_argument('--knots', type=float, nargs='*',
+                        help='knot distances in --distance-units (default: evenly spaced quantiles)')
+    parser.add_argument('--segments', type=int, default=2, help='number of pieces when --knots is not given')
+    args = parser.parse_args()
+
+    distances, drops = readMeasurements(args.csv, args.distance_units, args.drop_units)
+    if args.knots is not None:
+        knots = [k * DISTANCE_TO_METERS[args.distance_units] for k in args.knots]
+    else:
+        knots = np.quantile(distances, np.linspace(0, 1, args.segments + 1)[1:-1])
+
+    try:
+        breakpoints, coefficients = fitDropProfile(distances, drops, knots, args.degree)
+    except ValueError as e:
+        raise SystemExit(f'[FATAL ERROR] {e}')
+    profile = DropProfile(breakpoints, coefficients, args.name)
+    rms = reportResiduals(profile, distances, drops)
+
+    with open(args.output, 'wt') as f:
+        json.dump({
+            'name': args.name,
+            'distance_units': 'm',
+            'drop_units': 'cm',
+            'degree': args.degree,
+            'breakpoints': breakpoints,
+            'coefficients': coefficients,
+            'rms_residual_cm': rms,
+            'samples': len(distances),
+            'fitted': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }, f, indent=2)
+    print(f'[info] Profile written to {args.output}')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import bisect
+import json
+
+class DropProfile:
+    """Runtime evaluator for a drop profile written by Drop_Calibration.py.
+
+    The profile is a continuous piecewise polynomial. Segment i covers
+    breakpoints[i] <= distance < breakpoints[i + 1] and is stored in Horner
+    order (highest power first) in the local variable distance - breakpoints[i].
+    Distances outside the calibrated range use the first or last segment.
+
+    Calling the profile is a drop-in replacement for calculateVertDropOrbeeze:
+    distance in meters in, vertical drop in centimeters out.
+    """
+
+    def __init__(self, breakpoints, coefficients, name=''):
+        if len(coefficients) != len(breakpoints) - 1:
+            raise ValueError('A drop profile needs one coefficient list per segment')
+        self.name = name
+        self.breakpoints = tuple(float(b) for b in breakpoints)
+        self.coefficients = tuple(tuple(float(c) for c in segment) for segment in coefficients)
+        # Only the interior breakpoints are needed to pick a segment
+        self._inner = self.breakpoints[1:-1]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rt') as f:
+            profile = json.load(f)
+        return cls(profile['breakpoints'], profile['coefficients'], profile.get('name', ''))
+
+    def __call__(self, distance):
+        i = bisect.bisect_right(self._inner, distance)
+        u = distance - self.breakpoints[i]
+        result = 0.0
+        for c in self.coefficients[i]:
+            result = result * u + c
+        return result
+
+    def evaluate_array(self, distances):
+        """Vectorized evaluation for building tables, distances is a NumPy array"""
+        import numpy as np
+
+        distances = np.asarray(distances, dtype=np.float64)
+        index = np.searchsorted(self._inner, distances, side='right')
+        u = distances - np.asarray(self.breakpoints)[index]
+
+        degree = max(len(segment) for segment in self.coefficients)
+        table = np.zeros((len(self.coefficients), degree))
+        for i, segment in enumerate(self.coefficients):
+            table[i, degree - len(segment):] = segment
+
+        result = np.zeros_like(distances)
+        for column in table.T:
+            result = result * u + column[index]
+        return result
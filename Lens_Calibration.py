@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Lens distortion correction for the 50 mm Arducam lens.
+
+Calibrate once from chessboard photos taken through the scope camera:
+    python Lens_Calibration.py calib/*.jpg --pattern 9 6 --square 25 --output lens_50mm.json
+
+At runtime Undistorter loads the intrinsics and either remaps whole frames with
+fixed-point maps, built once per resolution and crop and cached on disk, or maps
+only the reticle points, which costs next to nothing per frame.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+def calibrateFromImages(paths, pattern=(9, 6), square_mm=25.0):
+    """Runs OpenCV chessboard calibration. Return: dict with the intrinsics and RMS reprojection error"""
+    objp = np.zeros((pattern[0] * pattern[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:pattern[0], 0:pattern[1]].T.reshape(-1, 2) * square_mm
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+    object_points = []
+    image_points = []
+    image_size = None
+    for path in paths:
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            print(f'[WARNING] Could not read {path}')
+            continue
+        if image_size is None:
+            image_size = gray.shape[::-1]
+        elif gray.shape[::-1] != image_size:
+            print(f'[WARNING] {path} has a different resolution, skipped')
+            continue
+
+        found, corners = cv2.findChessboardCorners(gray, pattern, None)
+        if not found:
+            print(f'[WARNING] No chessboard found in {path}')
+            continue
+        object_points.append(objp)
+        image_points.append(cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria))
+
+    if len(image_points) < 3:
+        raise ValueError('At least 3 images with a detected chessboard are needed')
+
+    rms, camera_matrix, dist_coeffs, _, _ = cv2.calibrateCamera(
+        object_points, image_points, image_size, None, None)
+    print(f'[info] Calibrated from {len(image_points)} images, RMS reprojection error {rms:.3f} px')
+    return {
+        'image_size': list(image_size),
+        'camera_matrix': camera_matrix.tolist(),
+        'dist_coeffs': dist_coeffs.ravel().tolist(),
+        'rms_error_px': rms,
+    }
+
+class Undistorter:
+    """Applies stored lens intrinsics at any output resolution and sensor crop.
+
+    crop is (x, y, w, h) in pixels of the calibration image that ends up
+    scaled to size, None means the whole calibration image.
+    """
+
+    def __init__(self, intrinsics_path, cache_dir='calibration_cache'):
+        with open(intrinsics_path, 'rt') as f:
+            intrinsics = json.load(f)
+        self.image_size = tuple(intrinsics['image_size'])
+        self.camera_matrix = np.array(intrinsics['camera_matrix'], dtype=np.float64)
+        self.dist_coeffs = np.array(intrinsics['dist_coeffs'], dtype=np.float64)
+        self.cache_dir = cache_dir
+        self._maps = {}
+        self._matrices = {}
+
+    def camera_matrix_for(self, size, crop=None):
+        """Camera matrix of the calibrated lens as seen in an output of the given size and crop"""
+        key = (tuple(size), tuple(crop) if crop else None)
+        if key not in self._matrices:
+            x, y, w, h = crop if crop else (0, 0, *self.image_size)
+            sx = size[0] / w
+            sy = size[1] / h
+            K = self.camera_matrix.copy()
+            K[0, 0] *= sx
+            K[0, 2] = (K[0, 2] - x) * sx
+            K[1, 1] *= sy
+            K[1, 2] = (K[1, 2] - y) * sy
+            self._matrices[key] = K
+        return self._matrices[key]
+
+    def maps(self, size, crop=None):
+        """Fixed-point remap tables for this resolution and crop, from memory, disk or built once"""
+        key = (tuple(size), tuple(crop) if crop else None)
+        if key in self._maps:
+            return self._maps[key]
+
+        K = self.camera_matrix_for(size, crop)
+        digest = hashlib.sha1(np.concatenate([K.ravel(), self.dist_coeffs, np.asarray(size, float)]).tobytes())
+        path = os.path.join(self.cache_dir, f'undistort_{size[0]}x{size[1]}_{digest.hexdigest()[:12]}.npz')
+
+        if os.path.exists(path):
+            cached = np.load(path)
+            maps = (cached['map1'], cached['map2'])
+        else:
+            # CV_16SC2 maps are about half the memory of float maps and remap faster
+            maps = cv2.initUndistortRectifyMap(K, self.dist_coeffs, None, K, tuple(size), cv2.CV_16SC2)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.savez(path, map1=maps[0], map2=maps[1])
+            print(f'[info] Undistortion maps cached in {path}')
+
+        self._maps[key] = maps
+        return maps
+
+    def undistort_frame(self, frame, crop=None):
+        """Remap a whole frame to the ideal pinhole image"""
+        size = (frame.shape[1], frame.shape[0])
+        map1, map2 = self.maps(size, crop)
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+
+    def distort_points(self, points, size, crop=None):
+        """Where ideal pinhole pixel coordinates appear in the raw, distorted frame.
+
+        This is what the reticle needs: the ballistic math gives pinhole positions,
+        the shooter sees the distorted image.
+        """
+        K = self.camera_matrix_for(size, crop)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        normalized = np.empty((len(points), 3))
+        normalized[:, 0] = (points[:, 0] - K[0, 2]) / K[0, 0]
+        normalized[:, 1] = (points[:, 1] - K[1, 2]) / K[1, 1]
+        normalized[:, 2] = 1.0
+        projected, _ = cv2.projectPoints(normalized, np.zeros(3), np.zeros(3), K, self.dist_coeffs)
+        return projected.reshape(-1, 2)
+
+    def undistort_points(self, points, size, crop=None):
+        """Ideal pinhole coordinates of points picked in the raw, distorted frame"""
+        K = self.camera_matrix_for(size, crop)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        return cv2.undistortPoints(points, K, self.dist_coeffs, P=K).reshape(-1, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the scope lens from chessboard images.')
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--pattern', type=int, nargs=2, default=(9, 6), help='inner corners per row and column')
+    parser.add_argument('--square', type=float, default=25.0, help='chessboard square size in mm')
+    parser.add_argument('--output', default='lens_50mm.json')
+    args = parser.parse_args()
+
+    intrinsics = calibrateFromImages(args.images, tuple(args.pattern), args.square)
+    with open(args.output, 'wt') as f:
+        json.dump(intrinsics, f, indent=2)
+    print(f'[info] Intrinsics written to {args.output}')
+
+if __name__ == "__main__":
+    main()
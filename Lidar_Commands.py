@@ -0,0 +1,138 @@
+import time
+
+# TF-mini Plus serial protocol. Commands and their responses are framed as
+# 0x5A, length, command id, payload..., checksum. Measurements are 9 byte
+# frames starting with 0x59 0x59. Both checksums are the low byte of the sum.
+COMMAND_HEADER = 0x5A
+DATA_HEADER = 0x59
+DATA_FRAME_LENGTH = 9
+
+ID_GET_VERSION = 0x01
+ID_SYSTEM_RESET = 0x02
+ID_FRAME_RATE = 0x03
+ID_TRIGGER = 0x04
+ID_OUTPUT_ENABLE = 0x07
+ID_RESTORE_DEFAULTS = 0x10
+ID_SAVE_SETTINGS = 0x11
+
+DEFAULT_FRAME_RATE = 100
+
+class LidarCommandError(Exception):
+    """Raised when the LIDAR does not answer a command or answers it incorrectly"""
+
+def checksum(data):
+    return sum(data) & 0xFF
+
+def buildCommand(command_id, payload=b''):
+    """Returns the bytes of a command frame, including length and checksum"""
+    frame = bytes([COMMAND_HEADER, len(payload) + 4, command_id]) + bytes(payload)
+    return frame + bytes([checksum(frame)])
+
+def parseDataFrame(frame):
+    """Parses a 9 byte measurement frame.
+
+    Return: (distance, strength, temperature) - distance in cm, temperature in Celsius.
+    Raises LidarCommandError if the header or checksum is wrong.
+    """
+    if len(frame) != DATA_FRAME_LENGTH or frame[0] != DATA_HEADER or frame[1] != DATA_HEADER:
+        raise LidarCommandError('Not a LIDAR data frame')
+    if checksum(frame[:8]) != frame[8]:
+        raise LidarCommandError('Data frame checksum failed')
+    distance = frame[2] + frame[3] * 256
+    strength = frame[4] + frame[5] * 256
+    temperature = (frame[6] + frame[7] * 256) / 8 - 256
+    return distance, strength, temperature
+
+class TFminiDevice:
+    """Command interface to a TF-mini Plus over an open serial.Serial (or compatible) port.
+
+    The port should be opened with a read timeout, otherwise a missing reply blocks forever.
+    """
+
+    def __init__(self, ser, timeout=0.2):
+        self.ser = ser
+        self.timeout = timeout
+
+    def get_version(self):
+        """Return the firmware version as a string, e.g. '2.0.6'"""
+        payload = self._transact(ID_GET_VERSION)
+        return f'{payload[2]}.{payload[1]}.{payload[0]}'
+
+    def set_frame_rate(self, hz):
+        """Set the streaming output rate in Hz. 0 switches the sensor to trigger mode."""
+        if hz < 0 or hz > 1000:
+            raise ValueError('Frame rate must be between 0 and 1000 Hz')
+        payload = bytes([hz & 0xFF, hz >> 8])
+        if self._transact(ID_FRAME_RATE, payload) != payload:
+            raise LidarCommandError('LIDAR did not accept the frame rate')
+
+    def enable_trigger_mode(self):
+        """Stop streaming, measurements are then only taken by trigger()"""
+        self.set_frame_rate(0)
+
+    def set_output_enabled(self, enabled):
+        payload = bytes([1 if enabled else 0])
+        if self._transact(ID_OUTPUT_ENABLE, payload) != payload:
+            raise LidarCommandError('LIDAR did not accept the output setting')
+
+    def trigger(self):
+        """Take a single measurement. Return: (distance, strength, temperature)"""
+        self.ser.reset_input_buffer()
+        self.ser.write(buildCommand(ID_TRIGGER))
+        return parseDataFrame(self._read_data_frame(time.monotonic() + self.timeout))
+
+    def save_settings(self):
+        """Persist the current settings in the sensor's flash"""
+        self._check_status(self._transact(ID_SAVE_SETTINGS))
+
+    def restore_defaults(self):
+        self._check_status(self._transact(ID_RESTORE_DEFAULTS))
+
+    def system_reset(self):
+        self._check_status(self._transact(ID_SYSTEM_RESET))
+
+    def _check_status(self, payload):
+        if len(payload) != 1 or payload[0] != 0:
+            raise LidarCommandError('LIDAR reported the command as failed')
+
+    def _transact(self, command_id, payload=b''):
+        """Send a command and return the payload of its response"""
+        self.ser.reset_input_buffer()
+        self.ser.write(buildCommand(command_id, payload))
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            # Measurement frames may still be streaming in front of the response
+            header = self._read(1, deadline)
+            if header[0] == DATA_HEADER:
+                self._read(DATA_FRAME_LENGTH - 1, deadline)
+                continue
+            if header[0] != COMMAND_HEADER:
+                continue
+
+            length = self._read(1, deadline)
+            if length[0] < 4:
+                continue
+            body = self._read(length[0] - 2, deadline)
+            frame = header + length + body
+            # A bad checksum here is usually a 0x5A inside a partial data frame, keep scanning
+            if checksum(frame[:-1]) != frame[-1] or body[0] != command_id:
+                continue
+            return body[1:-1]
+
+    def _read_data_frame(self, deadline):
+        while True:
+            if self._read(1, deadline)[0] != DATA_HEADER:
+                continue
+            second = self._read(1, deadline)
+            if second[0] != DATA_HEADER:
+                continue
+            return bytes([DATA_HEADER, DATA_HEADER]) + self._read(DATA_FRAME_LENGTH - 2, deadline)
+
+    def _read(self, count, deadline):
+        data = b''
+        while len(data) < count:
+            if time.monotonic() > deadline:
+                raise LidarCommandError('Timed out waiting for the LIDAR')
+            data += self.ser.read(count - len(data))
+        return data
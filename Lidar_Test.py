@@ -10,6 +10,7 @@ ECHO_PIN = 4
 # Constants for distance calculations
 SOUND_VELOCITY = 0.034
 CM_TO_INCH = 0.393701
+ECHO_TIMEOUT = 0.04 # seconds, longer than the echo of the sensor's 4 m maximum range
 
 def setup():
     # Set GPIO mode to BCM (using Broadcom SOC channel numbers)
@@ -22,7 +23,8 @@ def setup():
     # Initial state for trigger pin
     GPIO.output(TRIGGER_PIN, GPIO.LOW)
 
-def get_distance():
+def get_distance(timeout=ECHO_TIMEOUT):
+    """Returns (distance_cm, distance_inch), or (None, None) if no echo arrives within timeout seconds"""
     # Reset trigger pin
     GPIO.output(TRIGGER_PIN, GPIO.LOW)
     time.sleep(0.000002)  # 2 microseconds delay
@@ -36,13 +38,20 @@ def get_distance():
     start_time = time.time()
     stop_time = time.time()
     
-    # Wait for echo pin to go HIGH
+    deadline = start_time + timeout
+    
+    # Wait for echo pin to go HIGH, a missing or unwired sensor never raises it
     while GPIO.input(ECHO_PIN) == 0:
         start_time = time.time()
+        if start_time > deadline:
+            return None, None
         
     # Wait for echo pin to go LOW
+    deadline = start_time + timeout
     while GPIO.input(ECHO_PIN) == 1:
         stop_time = time.time()
+        if stop_time > deadline:
+            return None, None
     
     # Calculate duration in seconds
     duration = stop_time - start_time
@@ -64,6 +73,10 @@ def main():
         while True:
             # Get distance measurements
             distance_cm, distance_inch = get_distance()
+            if distance_cm is None:
+                print("No echo received")
+                time.sleep(0.1)
+                continue
             
             # Print the distances
             print(f"Distance (cm): {distance_cm:.2f}")
@@ -0,0 +1,123 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+LEVEL_NAMES = ('off', 'gain', 'gain+denoise', 'gain+denoise+clahe')
+
+class LowLightEnhancer:
+    """Optional low-light stage for the camera preview with a per-frame time budget.
+
+    Steps, cheapest first: gain/gamma lookup table, temporal denoise (running
+    average with the previous output) and CLAHE on the luma channel. The frame
+    is cut into horizontal bands processed on a thread pool, OpenCV releases the
+    GIL so the bands really run in parallel. After every frame the measured cost
+    is compared with budget_ms: over budget drops the most expensive step, a
+    sustained headroom tries to add it back.
+
+    With roi_size=(w, h) the full stack only runs around the reticle, the rest
+    of the frame only gets the lookup table.
+    """
+
+    def __init__(self, gain=2.0, gamma=0.6, clahe_clip=2.0, denoise_strength=0.5,
+                 budget_ms=12.0, workers=4, roi_size=None, max_level=3):
+        self.clahe_clip = clahe_clip
+        self.denoise_strength = denoise_strength
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.roi_size = roi_size
+        self.max_level = max_level
+        self.level = max_level
+        self.last_ms = 0.0
+        self.level_cost_ms = {}
+        self.headroom_frames = 0
+        self.previous = None
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.clahe = [cv2.createCLAHE(clipLimit=clahe_clip) for i in range(workers)] # One per band, not thread-safe
+        self.set_gain_gamma(gain, gamma)
+
+    def set_gain_gamma(self, gain, gamma):
+        values = np.arange(256, dtype=np.float32) / 255
+        self.lut = np.clip(255 * gain * values ** gamma, 0, 255).astype(np.uint8)
+
+    def process(self, frame, center=None):
+        """Enhance a BGR frame and return the result, center is the reticle position for roi_size"""
+        started = time.perf_counter()
+        level = self.level
+        if level == 0:
+            return frame
+
+        height, width = frame.shape[:2]
+        if self.previous is not None and self.previous.shape != frame.shape:
+            self.previous = None
+
+        if self.roi_size is not None and center is not None:
+            # Everything outside the ROI only gets the cheap lookup table
+            output = cv2.LUT(frame, self.lut)
+            w, h = self.roi_size
+            x0 = min(max(0, center[0] - w // 2), max(0, width - w))
+            y0 = min(max(0, center[1] - h // 2), max(0, height - h))
+            x1 = min(width, x0 + w)
+            y1 = min(height, y0 + h)
+        else:
+            output = np.empty_like(frame)
+            x0, y0, x1, y1 = 0, 0, width, height
+
+        bands = np.linspace(y0, y1, self.workers + 1).astype(int)
+        futures = [self.pool.submit(self._process_band, frame, output, i, bands[i], bands[i + 1], x0, x1, level)
+                   for i in range(self.workers) if bands[i] < bands[i + 1]]
+        for future in futures:
+            future.result()
+
+        if level >= 2:
+            self.previous = output
+        self._adapt(level, (time.perf_counter() - started) * 1000)
+        return output
+
+    def _process_band(self, frame, output, index, y0, y1, x0, x1, level):
+        if level < 3:
+            band = cv2.LUT(frame[y0:y1, x0:x1], self.lut)
+        else:
+            # CLAHE looks at neighbouring rows, so work on an overlapping band and keep the core
+            overlap = 16
+            top = max(0, y0 - overlap)
+            bottom = min(frame.shape[0], y1 + overlap)
+            extended = cv2.LUT(frame[top:bottom, x0:x1], self.lut)
+            ycrcb = cv2.cvtColor(extended, cv2.COLOR_BGR2YCrCb)
+            rows = max(1, round(8 * (bottom - top) / frame.shape[0]))
+            self.clahe[index].setTilesGridSize((8, rows))
+            ycrcb[:, :, 0] = self.clahe[index].apply(ycrcb[:, :, 0])
+            band = cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)[y0 - top:y1 - top]
+
+        if level >= 2 and self.previous is not None:
+            band = cv2.addWeighted(band, 1 - self.denoise_strength,
+                                   self.previous[y0:y1, x0:x1], self.denoise_strength, 0)
+        output[y0:y1, x0:x1] = band
+
+    def _adapt(self, level, elapsed_ms):
+        self.last_ms = elapsed_ms
+        cost = self.level_cost_ms.get(level)
+        self.level_cost_ms[level] = elapsed_ms if cost is None else 0.9 * cost + 0.1 * elapsed_ms
+
+        if elapsed_ms > self.budget_ms and level > 1:
+            self.level = level - 1
+            self.headroom_frames = 0
+            print(f'[info] Low-light stage over budget ({elapsed_ms:.1f} ms), now {LEVEL_NAMES[self.level]}')
+            return
+
+        if level < self.max_level and elapsed_ms < 0.5 * self.budget_ms:
+            self.headroom_frames += 1
+            # A step that was already too slow is only retried occasionally, the scene may have changed
+            known_cost = self.level_cost_ms.get(level + 1)
+            wait = 300 if known_cost is not None and known_cost > self.budget_ms else 30
+            if self.headroom_frames >= wait:
+                self.level = level + 1
+                self.headroom_frames = 0
+                if self.level >= 2:
+                    self.previous = None
+        else:
+            self.headroom_frames = 0
+
+    def close(self):
+        self.pool.shutdown()
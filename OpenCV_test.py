@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import time
+from Display_Sinks import createSink, KeyReader
 
 # Function to draw crosshair and other overlays
 def draw_overlay(frame, crosshair_x, crosshair_y, sensor_data):
@@ -35,6 +36,10 @@ def draw_overlay(frame, crosshair_x, crosshair_y, sensor_data):
 # Initialize camera
 cap = cv2.VideoCapture(0)  # You'll need to use the proper picamera setup
 
+# 'fb' draws on the console framebuffer, 'null' measures the loop without a display
+sink = createSink('window')
+keys = KeyReader()
+
 while True:
     ret, frame = cap.read()
     if not ret:
@@ -56,10 +61,11 @@ while True:
     result = draw_overlay(frame, crosshair_x, crosshair_y, sensor_data)
     
     # Display the resulting frame
-    cv2.imshow('Scope View', result)
+    sink.show(result)
     
-    if cv2.waitKey(1) == ord('q'):
+    if (sink.poll_key() or keys.poll()) == ord('q'):
         break
 
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+keys.close()
+sink.close()
\ No newline at end of file
@@ -0,0 +1,187 @@
+import cv2
+import numpy as np
+
+class OverlayManager:
+    """Keeps one persistent RGBA overlay buffer and only redraws what changed.
+
+    Every element (crosshair, text line) remembers its bounding box. Changing an
+    element marks its old and new boxes as dirty. commit() clears and redraws
+    only the dirty rectangles in place, then hands the buffer to the backend.
+    If nothing changed, commit() does nothing at all.
+    """
+
+    def __init__(self, width, height, backend):
+        self.width = width
+        self.height = height
+        self.backend = backend
+        self.buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.elements = {}
+        self.dirty = []
+
+    def set_crosshair(self, x, y, size=20, color=(0, 255, 0, 255), thickness=2, name='crosshair'):
+        pad = size + thickness
+        bbox = (x - pad, y - pad, x + pad + 1, y + pad + 1)
+        self._set_element(name, ('crosshair', x, y, size, color, thickness), bbox)
+
+    def set_text(self, name, text, origin, scale=0.7, color=(255, 255, 255, 255), thickness=2,
+                 font=cv2.FONT_HERSHEY_SIMPLEX):
+        (w, h), baseline = cv2.getTextSize(text, font, scale, thickness)
+        x, y = origin
+        bbox = (x - thickness, y - h - thickness, x + w + thickness, y + baseline + thickness)
+        self._set_element(name, ('text', text, origin, scale, color, thickness, font), bbox)
+
+    def remove(self, name):
+        if name in self.elements:
+            self._mark_dirty(self.elements.pop(name)[1])
+
+    def commit(self):
+        """Redraw the dirty regions and push the buffer to the backend. Returns False if nothing changed."""
+        if not self.dirty:
+            return False
+
+        rects = self._merge(self.dirty)
+        for x0, y0, x1, y1 in rects:
+            region = self.buffer[y0:y1, x0:x1]
+            region[:] = 0
+            for spec, bbox in self.elements.values():
+                if bbox[0] < x1 and bbox[2] > x0 and bbox[1] < y1 and bbox[3] > y0:
+                    # Draw into the view with shifted coordinates, OpenCV clips to the region
+                    self._draw(region, spec, x0, y0)
+
+        self.dirty = []
+        self.backend.update(self.buffer, rects)
+        return True
+
+    def close(self):
+        self.backend.close()
+
+    def _set_element(self, name, spec, bbox):
+        previous = self.elements.get(name)
+        if previous is not None and previous[0] == spec:
+            return
+        if previous is not None:
+            self._mark_dirty(previous[1])
+        self.elements[name] = (spec, bbox)
+        self._mark_dirty(bbox)
+
+    def _mark_dirty(self, bbox):
+        x0 = max(0, bbox[0])
+        y0 = max(0, bbox[1])
+        x1 = min(self.width, bbox[2])
+        y1 = min(self.height, bbox[3])
+        if x0 < x1 and y0 < y1:
+            self.dirty.append((x0, y0, x1, y1))
+
+    def _merge(self, rects):
+        """Union overlapping rectangles so no pixel is cleared and redrawn twice"""
+        merged = []
+        for rect in rects:
+            rect = list(rect)
+            i = 0
+            while i < len(merged):
+                other = merged[i]
+                if rect[0] < other[2] and rect[2] > other[0] and rect[1] < other[3] and rect[3] > other[1]:
+                    rect = [min(rect[0], other[0]), min(rect[1], other[1]),
+                            max(rect[2], other[2]), max(rect[3], other[3])]
+                    merged.pop(i)
+                    i = 0
+                else:
+                    i += 1
+            merged.append(rect)
+        return [tuple(rect) for rect in merged]
+
+    def _draw(self, image, spec, dx, dy):
+        if spec[0] == 'crosshair':
+            _, x, y, size, color, thickness = spec
+            x -= dx
+            y -= dy
+            cv2.line(image, (x - size, y), (x + size, y), color, thickness)
+            cv2.line(image, (x, y - size), (x, y + size), color, thickness)
+        elif spec[0] == 'text':
+            _, text, (x, y), scale, color, thickness, font = spec
+            cv2.putText(image, text, (x - dx, y - dy), font, scale, color, thickness)
+
+class PiCameraOverlayBackend:
+    """Shows the buffer with picamera's hardware overlay, added once and updated in place"""
+
+    def __init__(self, camera, layer=3, alpha=255):
+        self.camera = camera
+        self.layer = layer
+        self.alpha = alpha
+        self.overlay = None
+
+    def update(self, buffer, rects):
+        height, width = buffer.shape[:2]
+        if self.overlay is None:
+            self.overlay = self.camera.add_overlay(buffer, size=(width, height), format='rgba',
+                                                   layer=self.layer, alpha=self.alpha, fullscreen=False,
+                                                   window=(0, 0, width, height))
+        else:
+            # The MMAL renderer always takes the whole buffer, but no reallocation or teardown happens
+            self.overlay.update(buffer)
+
+    def close(self):
+        if self.overlay is not None:
+            self.camera.remove_overlay(self.overlay)
+            self.overlay = None
+
+class MockOverlayBackend:
+    """Backend-agnostic stand-in for testing, records what would have been pushed"""
+
+    def __init__(self):
+        self.updates = 0
+        self.pixels_updated = 0
+        self.last_rects = []
+        self.image = None
+
+    def update(self, buffer, rects):
+        self.updates += 1
+        self.last_rects = list(rects)
+        self.pixels_updated += sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+        self.image = buffer.copy()
+
+    def close(self):
+        pass
+
+# Checks incremental redraws against a full redraw with the mock backend
+if __name__ == "__main__":
+    backend = MockOverlayBackend()
+    overlay = OverlayManager(640, 480, backend)
+    overlay.set_crosshair(320, 240)
+    overlay.set_text('range', 'Range: 300m', (10, 30))
+    overlay.set_text('wind', 'Wind: 5 mph', (10, 55))
+    assert overlay.commit()
+    print(f'[info] First commit pushed {len(backend.last_rects)} rects, {backend.pixels_updated} px')
+
+    # Setting the same values again changes nothing and pushes nothing
+    overlay.set_crosshair(320, 240)
+    overlay.set_text('range', 'Range: 300m', (10, 30))
+    assert not overlay.commit(), 'commit() pushed an unchanged overlay'
+    assert backend.updates == 1
+
+    # Moving the crosshair only touches the union of its old and new boxes
+    before = backend.image.copy()
+    old_box = overlay.elements['crosshair'][1]
+    overlay.set_crosshair(326, 251)
+    new_box = overlay.elements['crosshair'][1]
+    pixels_before = backend.pixels_updated
+    assert overlay.commit()
+    expected = overlay._merge([old_box, new_box])
+    assert backend.last_rects == expected, f'{backend.last_rects} != {expected}'
+    outside = np.ones((480, 640), dtype=bool)
+    for x0, y0, x1, y1 in backend.last_rects:
+        outside[y0:y1, x0:x1] = False
+    assert np.array_equal(backend.image[outside], before[outside]), 'Pixels outside the dirty rects changed'
+    print(f'[info] Moved crosshair pushed {backend.last_rects}, {backend.pixels_updated - pixels_before} px '
+          f'of {640 * 480}')
+
+    # Change text, remove an element, then compare against drawing everything from scratch
+    overlay.set_text('range', 'Range: 12.5m', (10, 30))
+    overlay.remove('wind')
+    overlay.set_crosshair(100, 400)
+    assert overlay.commit()
+    full = np.zeros_like(overlay.buffer)
+    for spec, bbox in overlay.elements.values():
+        overlay._draw(full, spec, 0, 0)
+    assert np.array_equal(backend.image, full), 'Incremental buffer differs from a full redraw'
+    print('[info] Incremental overlay matches a full redraw')
@@ -1,8 +1,8 @@
 from picamera import PiCamera
 from picamera.array import PiRGBArray
-import numpy as np
 import cv2
 import time
+from Overlay_Manager import OverlayManager, PiCameraOverlayBackend
 
 # Initialize camera
 camera = PiCamera()
@@ -13,47 +13,24 @@ rawCapture = PiRGBArray(camera, size=(640, 480))
 # Allow camera to warm up
 time.sleep(0.1)
 
-# Create an overlay for drawing
-overlay = None
+# Persistent overlay, only the parts that change are redrawn
 overlay_width, overlay_height = 640, 480
+overlay = OverlayManager(overlay_width, overlay_height, PiCameraOverlayBackend(camera, layer=3))
 
 for frame in camera.capture_continuous(rawCapture, format="bgr", use_video_port=True):
     image = frame.array
     
-    # Create a transparent overlay
-    overlay_img = np.zeros((overlay_height, overlay_width, 4), dtype=np.uint8)
-    
     # In the future, these coordinates would be calculated
     crosshair_x, crosshair_y = 320, 240
     
     # Draw crosshair on overlay
-    cv2.line(overlay_img, 
-             (crosshair_x - 20, crosshair_y), 
-             (crosshair_x + 20, crosshair_y), 
-             (0, 255, 0, 255), 2)
-    cv2.line(overlay_img, 
-             (crosshair_x, crosshair_y - 20), 
-             (crosshair_x, crosshair_y + 20), 
-             (0, 255, 0, 255), 2)
+    overlay.set_crosshair(crosshair_x, crosshair_y, size=20, color=(0, 255, 0, 255), thickness=2)
     
     # Add text for sensor data
-    cv2.putText(overlay_img, 
-                "Wind: 5.2 mph", 
-                (10, 30), 
-                cv2.FONT_HERSHEY_SIMPLEX, 
-                0.7, (255, 255, 255, 255), 2)
-    
-    # Remove previous overlay if it exists
-    if overlay:
-        camera.remove_overlay(overlay)
+    overlay.set_text('wind', "Wind: 5.2 mph", (10, 30))
     
-    # Add new overlay
-    overlay = camera.add_overlay(overlay_img.tobytes(), 
-                                 size=(overlay_width, overlay_height),
-                                 layer=3,
-                                 alpha=255,
-                                 fullscreen=False,
-                                 window=(0, 0, overlay_width, overlay_height))
+    # Push the overlay to the camera, skipped entirely when nothing moved
+    overlay.commit()
     
     # Clear the stream for the next frame
     rawCapture.truncate(0)
@@ -62,4 +39,5 @@ for frame in camera.capture_continuous(rawCapture, format="bgr", use_video_port=
     if cv2.waitKey(1) == ord('q'):
         break
 
+overlay.close()
 camera.close()
\ No newline at end of file
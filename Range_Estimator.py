@@ -0,0 +1,130 @@
+import math
+import threading
+
+# TF-mini Plus: +-6 cm up to 6 m, 1% of the distance beyond that (datasheet)
+LIDAR_MIN_SIGMA_CM = 6.0
+LIDAR_RELATIVE_SIGMA = 0.01
+LIDAR_MIN_RANGE_CM = 10
+LIDAR_MAX_RANGE_CM = 1200
+LIDAR_MIN_STRENGTH = 10
+LIDAR_REFERENCE_STRENGTH = 100 # Below this the LIDAR noise is inflated
+
+# HC-SR04 style ultrasonic sensor used in Lidar_Test.py
+ULTRASONIC_MIN_SIGMA_CM = 1.0
+ULTRASONIC_RELATIVE_SIGMA = 0.005
+ULTRASONIC_MIN_RANGE_CM = 2
+ULTRASONIC_MAX_RANGE_CM = 400
+
+class RangeEstimator:
+    """Constant-velocity Kalman filter fusing the LIDAR and ultrasonic rangefinders.
+
+    All ranges are in centimeters and all timestamps are in seconds on the
+    time.monotonic() clock. Readings from both sensors are weighted by their
+    expected noise, readings far outside the predicted range are rejected, and
+    predict() extrapolates the range to an arbitrary timestamp (e.g. the
+    capture time of a camera frame).
+    """
+
+    def __init__(self, process_noise=400.0, gate_sigmas=4.0, max_rejects=5, max_extrapolation=0.5):
+        self.process_noise = process_noise # Acceleration noise of the target range, (cm/s^2)^2 per second
+        self.gate_sigmas = gate_sigmas
+        self.max_rejects = max_rejects # Consecutive outliers before assuming a new target
+        self.max_extrapolation = max_extrapolation
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the current track"""
+        with self.lock:
+            self.range_cm = None
+            self.rate_cm_s = 0.0
+            self.P = [[0.0, 0.0], [0.0, 0.0]]
+            self.timestamp = None
+            self.rejected = 0
+            self.accepted = 0
+
+    def add_lidar(self, distance_cm, strength, timestamp):
+        """Feed one LIDAR frame. Returns True if it was used."""
+        if strength < LIDAR_MIN_STRENGTH:
+            return False
+        if distance_cm < LIDAR_MIN_RANGE_CM or distance_cm > LIDAR_MAX_RANGE_CM:
+            return False
+
+        sigma = max(LIDAR_MIN_SIGMA_CM, LIDAR_RELATIVE_SIGMA * distance_cm)
+        if strength < LIDAR_REFERENCE_STRENGTH:
+            sigma *= math.sqrt(LIDAR_REFERENCE_STRENGTH / strength)
+        return self.add_measurement(distance_cm, sigma ** 2, timestamp)
+
+    def add_ultrasonic(self, distance_cm, timestamp):
+        """Feed one ultrasonic reading. Returns True if it was used."""
+        if distance_cm < ULTRASONIC_MIN_RANGE_CM or distance_cm > ULTRASONIC_MAX_RANGE_CM:
+            return False
+
+        sigma = max(ULTRASONIC_MIN_SIGMA_CM, ULTRASONIC_RELATIVE_SIGMA * distance_cm)
+        return self.add_measurement(distance_cm, sigma ** 2, timestamp)
+
+    def add_measurement(self, distance_cm, variance, timestamp):
+        """Run one predict/update step with a range measurement of the given variance"""
+        with self.lock:
+            if self.range_cm is None:
+                self._initialize(distance_cm, variance, timestamp)
+                return True
+
+            # Readings from the two sensor threads may arrive slightly out of order
+            dt = max(0.0, timestamp - self.timestamp)
+            self._predict(dt)
+            self.timestamp = max(self.timestamp, timestamp)
+
+            innovation = distance_cm - self.range_cm
+            S = self.P[0][0] + variance
+            if innovation * innovation > (self.gate_sigmas ** 2) * S:
+                self.rejected += 1
+                if self.rejected >= self.max_rejects:
+                    # The outliers agree with each other: the shooter changed targets
+                    self._initialize(distance_cm, variance, timestamp)
+                    return True
+                return False
+
+            K0 = self.P[0][0] / S
+            K1 = self.P[1][0] / S
+            self.range_cm += K0 * innovation
+            self.rate_cm_s += K1 * innovation
+
+            P00, P01 = self.P[0]
+            P10, P11 = self.P[1]
+            self.P = [[(1 - K0) * P00, (1 - K0) * P01],
+                      [P10 - K1 * P00, P11 - K1 * P01]]
+
+            self.rejected = 0
+            self.accepted += 1
+            return True
+
+    def predict(self, timestamp):
+        """Return the estimated range (cm) at the given timestamp, or None before the first reading"""
+        with self.lock:
+            if self.range_cm is None:
+                return None
+            dt = min(max(0.0, timestamp - self.timestamp), self.max_extrapolation)
+            return self.range_cm + self.rate_cm_s * dt
+
+    def _initialize(self, distance_cm, variance, timestamp):
+        self.range_cm = float(distance_cm)
+        self.rate_cm_s = 0.0
+        self.P = [[variance, 0.0], [0.0, 100.0 ** 2]]
+        self.timestamp = timestamp
+        self.rejected = 0
+        self.accepted += 1
+
+    def _predict(self, dt):
+        if dt == 0:
+            return
+        self.range_cm += self.rate_cm_s * dt
+
+        P00, P01 = self.P[0]
+        P10, P11 = self.P[1]
+        q = self.process_noise
+        P00 = P00 + dt * (P10 + P01) + dt * dt * P11 + q * dt ** 3 / 3
+        P01 = P01 + dt * P11 + q * dt ** 2 / 2
+        P10 = P10 + dt * P11 + q * dt ** 2 / 2
+        P11 = P11 + q * dt
+        self.P = [[P00, P01], [P10, P11]]
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""MJPEG over HTTP so spotters can watch the scope view from a phone or laptop.
+
+Open http://<pi address>:8000/ in a browser. /stream.mjpg is the raw stream,
+/snapshot.jpg a single frame and /stats per client statistics as JSON.
+
+Every rendered frame is JPEG encoded once and the same bytes are sent to every
+client. Each client only ever gets the newest frame, so a slow client skips
+frames instead of holding up the camera or the other clients.
+"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+BOUNDARY = 'scopeframe'
+SEND_BUFFER_BYTES = 32 * 1024
+
+INDEX_PAGE = b"""<html><head><title>Smart Scope</title></head>
+<body style="margin:0;background:#000"><img src="/stream.mjpg" style="width:100%"></body></html>"""
+
+class ClientStats:
+    """Per client send counters, latency is from the frame being grabbed to the write returning.
+
+    A write returns once the frame is in the kernel send buffer, not when the client
+    has read it. Stream sockets use a SEND_BUFFER_BYTES buffer so the two stay close,
+    but fps and latency are server side figures and frames_dropped is the frames
+    this client skipped because it could not keep up.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.connected_at = time.monotonic()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.latency_ms = 0.0
+
+    def record(self, timestamp, dropped):
+        latency = (time.monotonic() - timestamp) * 1000
+        self.latency_ms = latency if self.frames_sent == 0 else 0.9 * self.latency_ms + 0.1 * latency
+        self.frames_sent += 1
+        self.frames_dropped += dropped
+
+    def as_dict(self):
+        elapsed = max(time.monotonic() - self.connected_at, 1e-6)
+        return {
+            'address': f'{self.address[0]}:{self.address[1]}',
+            'fps': round(self.frames_sent / elapsed, 2),
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+            'latency_ms': round(self.latency_ms, 2),
+        }
+
+class FrameBroadcaster:
+    """Grabs frames from frame_source, encodes each one once and hands the bytes to all clients.
+
+    timestamp_source returns the capture time of the newest camera frame. When it
+    is given, a frame is only rendered and encoded if the camera delivered a new one.
+    """
+
+    def __init__(self, frame_source, fps=15, quality=80, timestamp_source=None):
+        self.frame_source = frame_source
+        self.timestamp_source = timestamp_source
+        self.fps = fps
+        self.quality = quality
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.jpeg = None
+        self.timestamp = 0.0
+        self.frames_encoded = 0
+        self.clients = {}
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._encode_frames)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def add_client(self, stats):
+        with self.condition:
+            self.clients[id(stats)] = stats
+
+    def remove_client(self, stats):
+        with self.condition:
+            del self.clients[id(stats)]
+
+    def _encode_frames(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        last_timestamp = None
+        while self.running:
+            started = time.monotonic()
+            frame_timestamp = self.timestamp_source() if self.timestamp_source is not None else None
+
+            # Nobody is watching or the camera has no new frame, don't spend CPU on encoding
+            if self.clients and (frame_timestamp is None or frame_timestamp != last_timestamp):
+                frame = self.frame_source()
+                if frame is not None:
+                    last_timestamp = frame_timestamp
+                    ok, encoded = cv2.imencode('.jpg', frame, params)
+                    if ok:
+                        with self.condition:
+                            self.jpeg = encoded.tobytes()
+                            self.timestamp = started
+                            self.sequence += 1
+                            self.frames_encoded += 1
+                            self.condition.notify_all()
+
+            delay = 1.0 / self.fps - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def wait_for_frame(self, last_sequence, timeout=1.0):
+        """Block until a frame newer than last_sequence exists. Return: (sequence, jpeg, timestamp)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > last_sequence or not self.running, timeout)
+            return self.sequence, self.jpeg, self.timestamp
+
+    def stats(self):
+        with self.condition:
+            clients = list(self.clients.values())
+        return {
+            'frames_encoded': self.frames_encoded,
+            'clients': [client.as_dict() for client in clients],
+        }
+
+class StreamRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        broadcaster = self.server.broadcaster
+        if self.path == '/':
+            self._send_body(INDEX_PAGE, 'text/html')
+        elif self.path == '/stats':
+            self._send_body(json.dumps(broadcaster.stats(), indent=2).encode(), 'application/json')
+        elif self.path == '/snapshot.jpg':
+            self._send_snapshot(broadcaster)
+        elif self.path == '/stream.mjpg':
+            self._send_stream(broadcaster)
+        else:
+            self.send_error(404)
+
+    def _send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_snapshot(self, broadcaster):
+        stats = ClientStats(self.client_address)
+        broadcaster.add_client(stats)
+        try:
+            _, jpeg, _ = broadcaster.wait_for_frame(broadcaster.sequence, timeout=2.0)
+        finally:
+            broadcaster.remove_client(stats)
+        if jpeg is None:
+            self.send_error(503, 'No frame available')
+        else:
+            self._send_body(jpeg, 'image/jpeg')
+
+    def _send_stream(self, broadcaster):
+        self.send_response(200)
+        self.send_header('Cache-Control', 'no-cache, private')
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.end_headers()
+
+        # A client that stops reading would otherwise block this thread forever
+        self.connection.settimeout(5)
+        # Keep at most about a frame queued in the kernel, so a slow client blocks the write
+        # and skips frames instead of the socket buffer hiding how fast it really reads
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_BYTES)
+        stats = ClientStats(self.client_address)
+        broadcaster.add_client(stats)
+        last_sequence = broadcaster.sequence
+        try:
+            while broadcaster.running:
+                sequence, jpeg, timestamp = broadcaster.wait_for_frame(last_sequence)
+                if sequence == last_sequence or jpeg is None:
+                    continue
+                dropped = sequence - last_sequence - 1 if stats.frames_sent else 0
+                last_sequence = sequence
+
+                self.wfile.write(f'--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n'
+                                 f'Content-Length: {len(jpeg)}\r\n\r\n'.encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b'\r\n')
+                stats.record(timestamp, dropped)
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            pass
+        finally:
+            broadcaster.remove_client(stats)
+
+    def log_message(self, format, *args):
+        pass
+
+class StreamServer:
+    """HTTP server for the MJPEG stream, runs in a background thread"""
+
+    def __init__(self, frame_source, host='0.0.0.0', port=8000, fps=15, quality=80, timestamp_source=None):
+        self.broadcaster = FrameBroadcaster(frame_source, fps, quality, timestamp_source)
+        self.httpd = ThreadingHTTPServer((host, port), StreamRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.broadcaster = self.broadcaster
+        self.port = self.httpd.server_address[1]
+
+    def start(self):
+        self.broadcaster.start()
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        print(f'[info] Streaming scope view on port {self.port}')
+
+    def stop(self):
+        self.broadcaster.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        return self.broadcaster.stats()
+
+def _load_test_client(port, seconds, read_delay, results, index):
+    """Reads the MJPEG stream like a browser would, optionally slowly"""
+    frames = 0
+    deadline = time.monotonic() + seconds
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        # A small receive window like a phone on Wi-Fi, loopback would otherwise buffer megabytes
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SEND_BUFFER_BYTES)
+        sock.connect(('127.0.0.1', port))
+        sock.sendall(b'GET /stream.mjpg HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        stream = sock.makefile('rb')
+        while time.monotonic() < deadline:
+            line = stream.readline()
+            if not line:
+                break
+            if line.lower().startswith(b'content-length:'):
+                stream.readline()
+                stream.read(int(line.split(b':')[1]))
+                frames += 1
+                if read_delay:
+                    time.sleep(read_delay)
+    results[index] = frames
+
+# Loopback load test: python Scope_Stream.py --clients 40 --slow 10
+if __name__ == "__main__":
+    import argparse
+
+    from better_PiCamera import ScopeOverlay
+    from Synthetic_Camera import SyntheticCamera
+
+    parser = argparse.ArgumentParser(description='Loopback load test of the MJPEG server.')
+    parser.add_argument('--clients', type=int, default=40)
+    parser.add_argument('--slow', type=int, default=10, help='how many of the clients read at ~2 fps')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--fps', type=int, default=30)
+    args = parser.parse_args()
+
+    scope = ScopeOverlay(width=640, height=480, fps=args.fps)
+    if not scope.start_camera(camera=SyntheticCamera(640, 480, args.fps)):
+        scope.stop()
+        raise SystemExit('[FATAL ERROR] The camera delivered no frame within 5 seconds')
+    scope.update_sensor_data({'Range': '300m', 'Wind': '5 mph'})
+    server = scope.start_stream(port=0, fps=args.fps)
+
+    results = [0] * args.clients
+    clients = []
+    for i in range(args.clients):
+        read_delay = 0.5 if i < args.slow else 0
+        thread = threading.Thread(target=_load_test_client,
+                                  args=(server.port, args.seconds, read_delay, results, i))
+        thread.start()
+        clients.append(thread)
+
+    time.sleep(args.seconds - 0.5)
+    stats = server.stats()
+    for client in clients:
+        client.join()
+    scope.stop()
+
+    for client in sorted(stats['clients'], key=lambda c: c['fps']):
+        print(f"[info] {client['address']:>21}  {client['fps']:6.2f} fps  "
+              f"{client['latency_ms']:7.2f} ms  dropped {client['frames_dropped']}")
+    delivered = sum(results)
+    print(f"[info] Encoded {stats['frames_encoded']} frames once, delivered {delivered} frames "
+          f"to {args.clients} clients ({args.slow} slow) in {args.seconds:.0f} s")
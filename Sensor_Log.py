@@ -0,0 +1,43 @@
+import bisect
+import csv
+
+FIELDS = ['timestamp', 'distance_cm', 'estimated_distance_cm', 'strength',
+          'lidar_temp_celsius', 'cpu_temp_celsius', 'crosswind_mps']
+
+class SensorLogWriter:
+    """Appends one CSV row of sensor readings per frame, timestamp is time.time()"""
+
+    def __init__(self, path):
+        self.file = open(path, 'wt', newline='', buffering=1)
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, timestamp, **values):
+        values['timestamp'] = f'{timestamp:.3f}'
+        self.writer.writerow(values)
+
+    def close(self):
+        self.file.close()
+
+class SensorLog:
+    """A recorded sensor log, at() returns the readings in effect at a given time"""
+
+    def __init__(self, path):
+        self.timestamps = []
+        self.rows = []
+        with open(path, 'rt', newline='') as f:
+            for row in csv.DictReader(f):
+                self.timestamps.append(float(row['timestamp']))
+                self.rows.append({key: float(value) for key, value in row.items()
+                                  if key != 'timestamp' and value not in ('', None)})
+        if not self.rows:
+            raise ValueError(f'{path} contains no sensor readings')
+
+    @property
+    def start(self):
+        return self.timestamps[0]
+
+    def at(self, timestamp):
+        """Latest readings at or before timestamp, the first row before the log starts"""
+        i = bisect.bisect_right(self.timestamps, timestamp) - 1
+        return self.rows[max(i, 0)]
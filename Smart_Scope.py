@@ -1,17 +1,48 @@
 import math
+import os
 import time
-import cv2
-import serial
 import threading
-from picamera2 import Picamera2
 from datetime import datetime as dt
-
-ser = serial.Serial("/dev/ttyS0", 115200)
+from Range_Estimator import RangeEstimator
+from Lidar_Commands import TFminiDevice, LidarCommandError, DEFAULT_FRAME_RATE
+from Drop_Profile import DropProfile
+from Startup_Timeline import StartupTimeline, StartupError
+from Sensor_Log import SensorLogWriter
+
+# cv2, numpy, picamera2 and pyserial are imported where they are first needed, in parallel during
+# startup, and the serial port is opened by openLidarSerial() rather than at import time.
+ser = None
+lidar_thread = None
+lidar_stop_event = threading.Event()
+range_estimator = RangeEstimator()
+
+LIDAR_TRIGGER_MODE = False # Take exactly one LIDAR measurement per camera frame instead of streaming
+lidar_trigger_event = threading.Event()
+
+# Written by Drop_Calibration.py, change this to change caliber. Relative to this file, not the working directory.
+DROP_PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles', 'orbeeze.json')
+try:
+    drop_profile = DropProfile.load(DROP_PROFILE_PATH)
+except FileNotFoundError:
+    drop_profile = None
 
 global_lidar_distance = 0
 global_lidar_strength = 0
 global_lidar_temp_celsius = 0
 global_cpu_temp_celsius = 0
+global_crosswind_mps = 0 # Positive blows from left to right, no wind sensor yet
+
+ULTRASONIC_ENABLED = False # Set when an HC-SR04 is wired to the pins in Lidar_Test.py
+
+DISPLAY_SINK = 'window' # 'window' for a desktop, 'fb' for the framebuffer on the console, 'null' to benchmark
+SENSOR_LOG_PATH = None # e.g. 'session_sensors.csv', one row per frame for Batch_Annotator.py
+
+def openLidarSerial():
+    global ser
+    import serial
+
+    ser = serial.Serial("/dev/ttyS0", 115200)
+    return ser
 
 def checkTemperatureSensors():
     global global_lidar_temp_celsius
@@ -42,10 +73,11 @@ def getLidarSensorData():
     try:
         if ser.is_open == False:
             ser.open()
-        while True:
+        while not lidar_stop_event.is_set():
             count = ser.in_waiting
             if count > 8:
                 recv = ser.read(9)
+                receivedAt = time.monotonic()
                 ser.reset_input_buffer()
                 if (recv[0] == 0x59 and recv[1] == 0x59) or (recv[0] == 'Y' and recv[1] == 'Y'):
                     distance = recv[2] + recv[3] * 256
@@ -75,6 +107,7 @@ def getLidarSensorData():
                     global_lidar_distance = distance
                     global_lidar_strength = strength
                     global_lidar_temp_celsius = temperature
+                    range_estimator.add_lidar(distance, strength, receivedAt)
 
     except OSError:
         print('[WARNING] OSError. Thread was running after Serial was closed.')
@@ -84,6 +117,103 @@ def getLidarSensorData():
     finally:
         print('[info] LIDAR sensor interface terminated.')
 
+def getLidarTriggeredData():
+    """Trigger mode counterpart of getLidarSensorData.
+
+    The LIDAR stops streaming and takes one measurement each time the main loop
+    sets lidar_trigger_event, so no UART traffic is wasted on frames that are thrown away.
+    This thread owns the serial port, so it also puts the LIDAR back to streaming once
+    stopLidar() asks it to exit.
+    """
+    global global_lidar_distance
+    global global_lidar_strength
+    global global_lidar_temp_celsius
+
+    print(f'[info] Receiving triggered data from LIDAR sensor')
+
+    device = None
+    try:
+        if ser.is_open == False:
+            ser.open()
+        ser.timeout = 0.05
+        device = TFminiDevice(ser)
+        device.enable_trigger_mode()
+
+        while ser.is_open and not lidar_stop_event.is_set():
+            if not lidar_trigger_event.wait(1):
+                continue
+            lidar_trigger_event.clear()
+            if lidar_stop_event.is_set():
+                break
+            try:
+                distance, strength, temperature = device.trigger()
+            except LidarCommandError as e:
+                print(f'[frame drop:sensor] {e}')
+                continue
+            receivedAt = time.monotonic()
+
+            if distance >= 65532 or strength < 10:
+                print(f'[frame drop:sensor] Bad LIDAR data, low signal or saturation')
+                continue
+
+            global_lidar_distance = distance
+            global_lidar_strength = strength
+            global_lidar_temp_celsius = temperature
+            range_estimator.add_lidar(distance, strength, receivedAt)
+
+    except LidarCommandError as e:
+        print(f'[FATAL ERROR] LIDAR did not enter trigger mode: {e}')
+    except OSError:
+        print('[WARNING] OSError. Thread was running after Serial was closed.')
+
+    finally:
+        if device is not None and ser.is_open:
+            restoreLidarStreaming()
+        print('[info] LIDAR sensor interface terminated.')
+
+def restoreLidarStreaming():
+    """Puts the LIDAR back to its default streaming rate after trigger mode"""
+    try:
+        TFminiDevice(ser).set_frame_rate(DEFAULT_FRAME_RATE)
+    except (LidarCommandError, OSError):
+        print('[WARNING] Could not restore the LIDAR frame rate.')
+
+def getUltrasonicSensorData():
+    """Feeds the ultrasonic rangefinder from Lidar_Test.py into the range estimator.
+
+    Only started when ULTRASONIC_ENABLED is set, if RPi.GPIO is unavailable only the LIDAR is used.
+    """
+    try:
+        import Lidar_Test
+    except ImportError:
+        print(f'[WARNING] Ultrasonic sensor unavailable. Using LIDAR only.')
+        return
+
+    print(f'[info] Receiving data from ultrasonic sensor')
+    Lidar_Test.setup()
+    try:
+        while True:
+            distance_cm, distance_inch = Lidar_Test.get_distance()
+            if distance_cm is not None:
+                range_estimator.add_ultrasonic(distance_cm, time.monotonic())
+            time.sleep(0.1)
+    finally:
+        Lidar_Test.GPIO.cleanup()
+        print('[info] Ultrasonic sensor interface terminated.')
+
+def getFrameTimestamp(request):
+    """Returns the capture time of a Picamera2 request on the time.monotonic() clock"""
+    now = time.monotonic()
+    try:
+        # SensorTimestamp is in nanoseconds on CLOCK_BOOTTIME, which keeps counting during suspend
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - request.get_metadata()["SensorTimestamp"] / 1e9
+    except (KeyError, TypeError, AttributeError):
+        return now
+    timestamp = now - age
+    if abs(now - timestamp) > 1:
+        return now
+    return timestamp
+
 def calculateVertDropOrbeeze(distance):
     """This function calculates the vertical drop in Imperial Units based on the distance to the target.
 
@@ -101,37 +231,93 @@ def calculateVertDropOrbeeze(distance):
     else:
         return (((-0.0368 * (distanceFeet ** 2)) + (2.2546 * distanceFeet) - 32.054) * 2.54)
 
-def calculateVertTranslation(distance):
-    """ HR: The methodology for this code and the code were given via a chatGPT prompt.
+def calculateVertDrop(distance):
+    """Vertical drop in centimeters at the given distance in meters.
 
-    This function calculates the FOV and scene height to translate the verticle drop off 
-    of the projectile to display it on the camera.
-    
-    Param: distance: float - the distance in meters to the target.
+    Uses the calibrated drop profile when one is available, otherwise the Excel regression.
+    """
+    if drop_profile is not None:
+        return drop_profile(distance)
+    return calculateVertDropOrbeeze(distance)
 
-    Return: void - display of the verticle drop to the screen.
+def calculatePixelsPerCentimeter(imageHeight=480):
+    """Pixels per centimeter of drop or drift, from the FOV of the HQ camera and the 50 mm lens.
+
+    imageHeight is the height in pixels of the image the offsets are drawn on.
     """
     sensorHeight = 6.3 #sensor height(mm) of the HQ camera
     focalLength = 50 #focal length(mm) of the fixed arducam lens
-    imageHeight = 480 #image height(px) of the HQ camera display
 
     vertFOVinRad = 2 * math.atan(sensorHeight / (2 * focalLength))
     vertFOVinDeg = math.degrees(vertFOVinRad)
 
     scopeZeroDistance = 11.8385265 #Different for each Caliber (ChatGPT gave me the idea of fixing the zeroing distance)
     sceneHeightCM = ((2 * math.tan(math.radians(vertFOVinDeg / 2)) * scopeZeroDistance) * 100)    
-    try:
-        vertDropCM = calculateVertDropOrbeeze(distance) #Change this method to change caliber
-    except ZeroDivisionError:
-        pass
-    try:
-        pixelsPerCentimeter = imageHeight / sceneHeightCM
-    except UnboundLocalError:
-        pass
-    pixelsOfVertDrop = vertDropCM * pixelsPerCentimeter
+    return imageHeight / sceneHeightCM
+
+def calculateVertTranslation(distance, imageHeight=480):
+    """ HR: The methodology for this code and the code were given via a chatGPT prompt.
+
+    This function calculates the FOV and scene height to translate the verticle drop off 
+    of the projectile to display it on the camera.
+    
+    Param: distance: float - the distance in meters to the target.
+    Param: imageHeight: int - image height(px) of the camera display.
+
+    Return: void - display of the verticle drop to the screen.
+    """
+    vertDropCM = calculateVertDrop(distance)
+    pixelsOfVertDrop = vertDropCM * calculatePixelsPerCentimeter(imageHeight)
     vertDropPixels = imageHeight / 2 - pixelsOfVertDrop
     return vertDropPixels
 
+def buildHoldoverTable(imageHeight=480):
+    """Precomputes the (range x crosswind) reticle offsets so the render loop only does a lookup"""
+    import numpy as np
+    from Holdover_Table import HoldoverTable, calculateWindDriftOrbeeze
+
+    if drop_profile is not None:
+        dropCM = drop_profile.evaluate_array
+    else:
+        dropCM = np.vectorize(calculateVertDropOrbeeze) #Change these methods to change caliber
+    return HoldoverTable(dropCM, calculateWindDriftOrbeeze, calculatePixelsPerCentimeter(imageHeight),
+                         image_height=imageHeight)
+
+def startCamera():
+    """Brings up the camera and waits for its first frame, which is the readiness check"""
+    from picamera2 import Picamera2
+
+    picam = Picamera2()
+    picam.configure(picam.create_preview_configuration(raw={"size":(1640,1232)},main={"format":'RGB888',"size":(640,480)}))
+    picam.start()
+    picam.capture_request().release()
+    return picam
+
+def startLidar():
+    global lidar_thread
+
+    openLidarSerial()
+    lidar_stop_event.clear()
+    if LIDAR_TRIGGER_MODE:
+        lidar_thread = threading.Thread(target = getLidarTriggeredData, daemon=True)
+    else:
+        lidar_thread = threading.Thread(target = getLidarSensorData, daemon=True)
+    lidar_thread.start()
+    return lidar_thread
+
+def stopLidar():
+    """Stops the LIDAR thread and closes the port. In trigger mode the thread restores streaming on its way out."""
+    lidar_stop_event.set()
+    lidar_trigger_event.set() # Wake the trigger thread if it is waiting for a frame
+    if lidar_thread is not None:
+        lidar_thread.join(2)
+    if ser is not None and ser.is_open:
+        ser.close()
+
+def importOpenCV():
+    import cv2
+    return cv2
+
 def main():
 
     global global_lidar_distance
@@ -139,50 +325,96 @@ def main():
     global global_lidar_temp_celsius
     global global_cpu_temp_celsius
 
-    thread_getLidarSensorData = threading.Thread(target = getLidarSensorData, daemon=True)
+    timeline = StartupTimeline()
+    keys = None
+    picam = None
+    if drop_profile is not None:
+        print(f'[info] Drop model: calibrated profile {DROP_PROFILE_PATH}')
+    else:
+        print(f'[WARNING] No drop profile at {DROP_PROFILE_PATH}. Drop model: Excel regression for Orbeeze.')
     thread_checkTemperatureSensors = threading.Thread(target = checkTemperatureSensors, daemon=True)
+    thread_getUltrasonicSensorData = threading.Thread(target = getUltrasonicSensorData, daemon=True)
 
     try:
         thread_checkTemperatureSensors.start()
-        thread_getLidarSensorData.start()
+        if ULTRASONIC_ENABLED:
+            thread_getUltrasonicSensorData.start()
 
         crosshairX = 320
         crosshairY = 240
-        picam = Picamera2()
-        picam.configure(picam.create_preview_configuration(raw={"size":(1640,1232)},main={"format":'RGB888',"size":(640,480)}))
-        picam.start()
+
+        # The camera is the slowest device, everything else is brought up alongside it
+        try:
+            startup = timeline.parallel(camera = startCamera, lidar = startLidar,
+                                        holdover_table = buildHoldoverTable, opencv = importOpenCV)
+        except StartupError as e:
+            picam = e.results.get('camera') # Closed in finally even though startup failed
+            raise
+        picam = startup['camera']
+        holdoverTable = startup['holdover_table']
+        cv2 = startup['opencv']
+        firstFrame = True
+
+        # Keys come from the window and from the terminal, so the framebuffer sink can still be quit
+        from Display_Sinks import createSink, KeyReader
+        sink = createSink(DISPLAY_SINK)
+        keys = KeyReader()
+        sensorLog = SensorLogWriter(SENSOR_LOG_PATH) if SENSOR_LOG_PATH else None
 
         # targetDistanceFeet = float(input())
         while True:
 
-            targetDistanceFeet = global_lidar_distance / 30.48
+            request = picam.capture_request()
+            img = request.make_array("main")
+            frameTimestamp = getFrameTimestamp(request)
+            request.release()
+            lidar_trigger_event.set()
+
+            # Range predicted at the moment the frame was captured, rather than the last raw reading
+            estimatedDistance = range_estimator.predict(frameTimestamp)
+            if estimatedDistance is None:
+                estimatedDistance = global_lidar_distance
+
+            targetDistanceFeet = estimatedDistance / 30.48
             targetDistanceMeters = targetDistanceFeet * 0.3048
             # print(calculateVertTranslation(targetDistanceMeters))
             print(f"[debug] Distance in cm:\t"+ str(global_lidar_distance))
+            print(f"[debug] Estimated Distance in cm:\t"+ str(round(estimatedDistance, 1)))
             print(f"[debug] Last Signal Strength:\t" + str(global_lidar_strength))
             print(f"[debug] Last LIDAR Temperature:\t" + str(global_lidar_temp_celsius))
             print(f"[debug] Last CPU Temperature:\t" + str(global_cpu_temp_celsius))
+            if sensorLog is not None:
+                sensorLog.write(time.time(), distance_cm=global_lidar_distance,
+                                estimated_distance_cm=round(estimatedDistance, 1),
+                                strength=global_lidar_strength, lidar_temp_celsius=global_lidar_temp_celsius,
+                                cpu_temp_celsius=global_cpu_temp_celsius, crosswind_mps=global_crosswind_mps)
             
-            img = picam.capture_array()
             img = cv2.drawMarker(img, (crosshairX, crosshairY), (0, 0, 0), cv2.MARKER_CROSS, 120, 2)
-            try:
-                crosshairYTrans = int(calculateVertTranslation(targetDistanceMeters))
-                img = cv2.circle(img, (crosshairX, crosshairYTrans), 3, (0,0, 255), -1)
-            except ZeroDivisionError:
-                pass
-            cv2.imshow("Output", img)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                if ser != None:
-                    ser.close()
+            xOffset, yOffset = holdoverTable.lookup(targetDistanceMeters, global_crosswind_mps)
+            img = cv2.circle(img, (crosshairX + int(xOffset), crosshairY + int(yOffset)), 3, (0,0, 255), -1)
+            sink.show(img)
+            if firstFrame:
+                timeline.mark('first frame shown')
+                timeline.report()
+                firstFrame = False
+            key = sink.poll_key() or keys.poll()
+            if key == ord('q'):
                 break
         
-        picam.stop()
-        picam.close()
+        if sensorLog is not None:
+            sensorLog.close()
+        sink.close()
 
     except KeyboardInterrupt:
         print(f'\n.\n.\n[WARNING] Exception:KeyboardInterrupt. Program terminating...')
 
     finally:
+        if picam is not None:
+            picam.stop()
+            picam.close()
+        stopLidar()
+        if keys is not None:
+            keys.close() # Give the terminal its line buffering back
         print(f"[info] Last Distance in cm:\t"+ str(global_lidar_distance))
         print(f"[info] Last Signal Strength:\t" + str(global_lidar_strength))
         print(f"[info] Last LIDAR Temperature:\t" + str(global_lidar_temp_celsius))
@@ -192,4 +424,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-:
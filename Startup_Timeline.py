@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+def processAge():
+    """Seconds since this process was started by the kernel, None if /proc is unavailable"""
+    try:
+        with open('/proc/self/stat', 'rt') as f:
+            # Field 22 is the start time in clock ticks after boot, the command name may contain spaces
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'rt') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupError(Exception):
+    """A parallel startup task failed. results holds what the other tasks returned, so it can be closed."""
+
+    def __init__(self, name, error, results):
+        super().__init__(f'{name} failed during startup: {error}')
+        self.name = name
+        self.results = results
+
+class StartupTimeline:
+    """Records how long each startup phase takes and prints a per-phase timeline.
+
+    Times are relative to the moment the process was started, so interpreter
+    startup and imports before the timeline was created show up as well.
+    """
+
+    def __init__(self):
+        now = time.monotonic()
+        age = processAge()
+        self.origin = now - age if age is not None else now
+        self.phases = []
+        self.lock = threading.Lock()
+        if age is not None:
+            self.phases.append(('python startup + imports', self.origin, now, threading.current_thread().name))
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append((name, started, time.monotonic(), threading.current_thread().name))
+
+    def mark(self, name):
+        now = time.monotonic()
+        with self.lock:
+            self.phases.append((name, now, now, threading.current_thread().name))
+
+    def parallel(self, **tasks):
+        """Run each task in its own thread as a phase, return their results by name.
+
+        Once all tasks have finished, the first exception is raised as a StartupError
+        that carries the results of the tasks that succeeded.
+        """
+        results = {}
+        errors = []
+
+        def run(name, task):
+            try:
+                with self.phase(name):
+                    results[name] = task()
+            except Exception as e:
+                errors.append((name, e))
+
+        threads = [threading.Thread(target=run, args=(name, task), name=name) for name, task in tasks.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            name, error = errors[0]
+            raise StartupError(name, error, results) from error
+        return results
+
+    def report(self):
+        print(f'[info] Startup timeline')
+        for name, started, ended, thread in sorted(self.phases, key=lambda p: (p[1], p[2])):
+            start_ms = (started - self.origin) * 1000
+            if ended == started:
+                print(f'[info] {start_ms:8.1f} ms  {name}')
+            else:
+                print(f'[info] {start_ms:8.1f} ms  {name} took {(ended - started) * 1000:.1f} ms ({thread})')
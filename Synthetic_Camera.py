@@ -0,0 +1,73 @@
+import math
+import time
+
+import numpy as np
+
+class SyntheticCamera:
+    """Stand-in for Picamera2 that renders a moving target, for testing without the camera.
+
+    Implements the subset of the Picamera2 API used by ScopeOverlay, so it can be
+    passed to ScopeOverlay.start_camera(camera=...). The target is a dark square
+    that drifts on a Lissajous path over a textured background, target_box(t)
+    returns where it is at a given time.monotonic() time.
+    """
+
+    def __init__(self, width=640, height=480, fps=30, target_size=40):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.target_size = target_size
+        self.start_time = time.monotonic()
+        self.frames_captured = 0
+
+        # Static background with enough texture for a tracker to lock onto
+        rng = np.random.default_rng(0)
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+        gradient = (0.5 * x + 0.3 * y).astype(np.uint8)
+        noise = rng.integers(0, 40, (height, width), dtype=np.uint8)
+        gray = np.clip(gradient.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        self.background = np.dstack([gray, gray, gray])
+
+        self.target = np.zeros((target_size, target_size, 3), dtype=np.uint8)
+        self.target[::4, :] = (0, 0, 200)
+        self.target[:, ::4] = (0, 0, 200)
+
+    # Picamera2 API used by ScopeOverlay
+    def create_video_configuration(self, **kwargs):
+        return kwargs
+
+    def configure(self, config):
+        size = config.get('main', {}).get('size')
+        if size and size != (self.width, self.height):
+            self.__init__(size[0], size[1], self.fps, self.target_size)
+
+    def start(self):
+        self.start_time = time.monotonic()
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def target_box(self, timestamp):
+        """Ground truth (x, y, w, h) of the target at the given time"""
+        t = timestamp - self.start_time
+        margin = self.target_size
+        x = (self.width - 2 * margin) * (0.5 + 0.4 * math.sin(0.7 * t)) + margin // 2
+        y = (self.height - 2 * margin) * (0.5 + 0.4 * math.sin(0.45 * t + 1.0)) + margin // 2
+        return int(x), int(y), self.target_size, self.target_size
+
+    def capture_array(self, name='main'):
+        # Pace like a real sensor running at self.fps
+        next_frame = self.start_time + (self.frames_captured + 1) / self.fps
+        delay = next_frame - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.frames_captured += 1
+
+        frame = self.background.copy()
+        x, y, w, h = self.target_box(time.monotonic())
+        frame[y:y + h, x:x + w] = self.target
+        return frame
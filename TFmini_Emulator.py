@@ -0,0 +1,158 @@
+import os
+import select
+import threading
+import time
+import tty
+
+import Lidar_Commands as lc
+
+class TFminiEmulator:
+    """Emulates a TF-mini Plus on a pseudo terminal for testing without the sensor.
+
+    Open self.port with serial.Serial like the real /dev/ttyS0. The emulator
+    streams measurement frames at the configured frame rate and answers the
+    commands implemented in Lidar_Commands.
+    """
+
+    def __init__(self, distance=500, strength=300, temperature=40.0):
+        self.distance = distance
+        self.strength = strength
+        self.temperature = temperature
+        self.frame_rate = lc.DEFAULT_FRAME_RATE
+        self.saved_frame_rate = lc.DEFAULT_FRAME_RATE
+        self.output_enabled = True
+        self.frames_sent = 0
+        self.commands = []
+        self.running = False
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if hasattr(self, 'thread'):
+            self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def data_frame(self):
+        raw_temperature = int((self.temperature + 256) * 8)
+        frame = bytes([lc.DATA_HEADER, lc.DATA_HEADER,
+                       self.distance & 0xFF, self.distance >> 8,
+                       self.strength & 0xFF, self.strength >> 8,
+                       raw_temperature & 0xFF, raw_temperature >> 8])
+        return frame + bytes([lc.checksum(frame)])
+
+    def _run(self):
+        buffer = b''
+        next_frame = time.monotonic()
+        while self.running:
+            streaming = self.frame_rate > 0 and self.output_enabled
+            timeout = max(0.0, next_frame - time.monotonic()) if streaming else 0.05
+            readable, _, _ = select.select([self.master], [], [], timeout)
+
+            if readable:
+                buffer += os.read(self.master, 256)
+                buffer = self._handle_commands(buffer)
+
+            if streaming and time.monotonic() >= next_frame:
+                self._send_frame()
+                next_frame = max(next_frame + 1.0 / self.frame_rate, time.monotonic() - 0.1)
+            elif not streaming:
+                next_frame = time.monotonic()
+
+    def _send_frame(self):
+        os.write(self.master, self.data_frame())
+        self.frames_sent += 1
+
+    def _handle_commands(self, buffer):
+        while buffer:
+            if buffer[0] != lc.COMMAND_HEADER:
+                buffer = buffer[1:]
+                continue
+            if len(buffer) >= 2 and buffer[1] < 4:
+                # Too short to be a command, the 0x5A was noise
+                buffer = buffer[1:]
+                continue
+            if len(buffer) < 2 or len(buffer) < buffer[1]:
+                return buffer
+            frame = buffer[:buffer[1]]
+            if lc.checksum(frame[:-1]) != frame[-1]:
+                # Resync one byte on, like TFminiDevice does
+                buffer = buffer[1:]
+                continue
+            buffer = buffer[buffer[1]:]
+            self._handle_command(frame[2], frame[3:-1])
+        return buffer
+
+    def _handle_command(self, command_id, payload):
+        self.commands.append(command_id)
+        if command_id == lc.ID_GET_VERSION:
+            self._respond(command_id, bytes([6, 0, 2]))
+        elif command_id == lc.ID_FRAME_RATE:
+            self.frame_rate = payload[0] + payload[1] * 256
+            self._respond(command_id, payload)
+        elif command_id == lc.ID_TRIGGER:
+            self._send_frame()
+        elif command_id == lc.ID_OUTPUT_ENABLE:
+            self.output_enabled = payload[0] == 1
+            self._respond(command_id, payload)
+        elif command_id == lc.ID_SAVE_SETTINGS:
+            self.saved_frame_rate = self.frame_rate
+            self._respond(command_id, bytes([0]))
+        elif command_id == lc.ID_RESTORE_DEFAULTS:
+            self.frame_rate = self.saved_frame_rate = lc.DEFAULT_FRAME_RATE
+            self.output_enabled = True
+            self._respond(command_id, bytes([0]))
+        elif command_id == lc.ID_SYSTEM_RESET:
+            self.frame_rate = self.saved_frame_rate
+            self.output_enabled = True
+            self._respond(command_id, bytes([0]))
+
+    def _respond(self, command_id, payload):
+        os.write(self.master, lc.buildCommand(command_id, payload))
+
+# Exercises the command API against the emulator
+if __name__ == "__main__":
+    import serial
+
+    emulator = TFminiEmulator(distance=1234, strength=250, temperature=35.5)
+    emulator.start()
+    ser = serial.Serial(emulator.port, 115200, timeout=0.05)
+    device = lc.TFminiDevice(ser)
+
+    try:
+        print(f'[info] Firmware version: {device.get_version()}')
+
+        time.sleep(0.2)
+        print(f'[info] Frames streamed at {emulator.frame_rate} Hz: {emulator.frames_sent}')
+
+        device.enable_trigger_mode()
+        time.sleep(0.1)
+        idle_frames = emulator.frames_sent
+        time.sleep(0.2)
+        assert emulator.frames_sent == idle_frames, 'Emulator kept streaming in trigger mode'
+
+        start = time.perf_counter()
+        for i in range(100):
+            distance, strength, temperature = device.trigger()
+            assert (distance, strength, temperature) == (1234, 250, 35.5)
+        elapsed = time.perf_counter() - start
+        print(f'[info] 100 triggered measurements in {elapsed * 1000:.1f} ms')
+
+        device.set_frame_rate(10)
+        device.save_settings()
+        assert emulator.saved_frame_rate == 10
+        device.restore_defaults()
+        assert emulator.frame_rate == lc.DEFAULT_FRAME_RATE
+        print('[info] All commands acknowledged')
+    finally:
+        ser.close()
+        emulator.stop()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import deque
+
+import cv2
+
+class TemplateTracker:
+    """Plain template matching in a search window, used when OpenCV has no KCF/CSRT build"""
+
+    def __init__(self, search_factor=2.0, min_score=0.4):
+        self.search_factor = search_factor
+        self.min_score = min_score
+
+    def init(self, frame, box):
+        x, y, w, h = [int(v) for v in box]
+        self.template = cv2.cvtColor(frame[y:y + h, x:x + w], cv2.COLOR_BGR2GRAY)
+        self.box = (x, y, w, h)
+
+    def update(self, frame):
+        x, y, w, h = self.box
+        pad_x = int(w * (self.search_factor - 1) / 2) + 1
+        pad_y = int(h * (self.search_factor - 1) / 2) + 1
+        x0 = max(0, x - pad_x)
+        y0 = max(0, y - pad_y)
+        x1 = min(frame.shape[1], x + w + pad_x)
+        y1 = min(frame.shape[0], y + h + pad_y)
+        if x1 - x0 < w or y1 - y0 < h:
+            return False, self.box
+
+        window = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (bx, by) = cv2.minMaxLoc(scores)
+        if score < self.min_score:
+            return False, self.box
+        self.box = (x0 + bx, y0 + by, w, h)
+        return True, self.box
+
+def createTracker(method='auto'):
+    """Return an OpenCV tracker, 'auto' prefers KCF and falls back to template matching"""
+    factories = {
+        'kcf': ['TrackerKCF_create', 'legacy.TrackerKCF_create'],
+        'csrt': ['TrackerCSRT_create', 'legacy.TrackerCSRT_create'],
+    }
+    if method == 'template':
+        return TemplateTracker()
+
+    for name in factories['kcf' if method == 'auto' else method]:
+        factory = cv2
+        for part in name.split('.'):
+            factory = getattr(factory, part, None)
+            if factory is None:
+                break
+        if factory is not None:
+            return factory()
+
+    if method == 'auto':
+        return TemplateTracker()
+    raise ValueError(f'This OpenCV build has no {method} tracker')
+
+class TargetTracker:
+    """Tracks a selected target on downscaled frames in a worker thread.
+
+    frame_source returns (frame, timestamp) of the newest camera frame, e.g.
+    ScopeOverlay.get_raw_frame. The worker runs at rate_hz on a copy scaled by
+    scale, independent of the display. get_box() interpolates the last two
+    tracker results to the timestamp of the frame being displayed.
+    """
+
+    def __init__(self, frame_source, rate_hz=10, scale=0.5, method='auto'):
+        # Raises ValueError here, in the caller, if this OpenCV build lacks the method
+        createTracker(method)
+        self.frame_source = frame_source
+        self.rate_hz = rate_hz
+        self.scale = scale
+        self.method = method
+        self.history = deque(maxlen=2)
+        self.pending_box = None
+        self.lost = False
+        self.lock = threading.Lock()
+        self.running = False
+
+        self.tracker_ms = 0.0
+        self.tracker_updates = 0
+        self.display_frames = 0
+        self.started_at = time.monotonic()
+
+    def select(self, box):
+        """Start tracking box = (x, y, w, h) in full resolution pixels"""
+        with self.lock:
+            self.pending_box = tuple(box)
+            self.history.clear()
+            self.lost = False
+
+    def start(self):
+        self.running = True
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self._track)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _track(self):
+        tracker = None
+        last_timestamp = None
+        while self.running:
+            started = time.monotonic()
+            frame, timestamp = self.frame_source()
+
+            if frame is not None and timestamp != last_timestamp:
+                last_timestamp = timestamp
+                small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+                with self.lock:
+                    pending = self.pending_box
+                    self.pending_box = None
+
+                try:
+                    if pending is not None:
+                        tracker = createTracker(self.method)
+                        tracker.init(small, tuple(int(v * self.scale) for v in pending))
+                        with self.lock:
+                            self.history.append((timestamp, pending))
+                    elif tracker is not None and not self.lost:
+                        ok, box = tracker.update(small)
+                        with self.lock:
+                            if ok:
+                                self.history.append((timestamp, tuple(v / self.scale for v in box)))
+                            else:
+                                self.lost = True
+                                print('[info] Tracker lost the target')
+                except (cv2.error, ValueError) as e:
+                    # Keep the worker alive, select() starts over with a new tracker
+                    print(f'[WARNING] Tracker failed, target lost: {e}')
+                    tracker = None
+                    with self.lock:
+                        self.lost = True
+
+                cost = (time.monotonic() - started) * 1000
+                self.tracker_ms = cost if self.tracker_updates == 0 else 0.9 * self.tracker_ms + 0.1 * cost
+                self.tracker_updates += 1
+
+            delay = 1.0 / self.rate_hz - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def frame_shown(self):
+        """Call once per frame that reaches the display, for display_fps in stats()"""
+        self.display_frames += 1
+
+    def get_box(self, timestamp):
+        """Target box (x, y, w, h) at timestamp, or None when nothing is tracked"""
+        with self.lock:
+            if self.lost or not self.history:
+                return None
+            history = list(self.history)
+
+        t1, box1 = history[-1]
+        if len(history) == 1 or t1 == history[0][0]:
+            return tuple(int(v) for v in box1)
+        t0, box0 = history[0]
+        # Extrapolate at most one tracker period beyond the newest result
+        t = min(timestamp, t1 + 1.0 / self.rate_hz)
+        f = (t - t0) / (t1 - t0)
+        return tuple(int(round(a + (b - a) * f)) for a, b in zip(box0, box1))
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return {
+            'tracker_ms': round(self.tracker_ms, 2),
+            'tracker_fps': round(self.tracker_updates / elapsed, 2),
+            'display_fps': round(self.display_frames / elapsed, 2),
+        }
+
+# Tracks the target of the synthetic camera and reports accuracy and cost
+if __name__ == "__main__":
+    import argparse
+
+    from better_PiCamera import ScopeOverlay
+    from Synthetic_Camera import SyntheticCamera
+
+    parser = argparse.ArgumentParser(description='Track the synthetic camera target.')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rate', type=float, default=10, help='tracker updates per second')
+    parser.add_argument('--scale', type=float, default=0.5)
+    parser.add_argument('--method', default='auto', choices=['auto', 'kcf', 'csrt', 'template'])
+    args = parser.parse_args()
+
+    camera = SyntheticCamera(640, 480, 30)
+    scope = ScopeOverlay(width=640, height=480, fps=30)
+    if not scope.start_camera(camera=camera):
+        scope.stop()
+        raise SystemExit('[FATAL ERROR] The camera delivered no frame within 5 seconds')
+
+    try:
+        tracker = scope.start_tracker(camera.target_box(time.monotonic()), rate_hz=args.rate,
+                                      scale=args.scale, method=args.method)
+    except ValueError as e:
+        scope.stop()
+        raise SystemExit(f'[FATAL ERROR] {e}')
+    errors = []
+    deadline = time.monotonic() + args.seconds
+    while time.monotonic() < deadline:
+        frame = scope.get_frame_with_overlay()
+        box = scope.target_box
+        if box is not None:
+            truth = camera.target_box(scope.frame_timestamp)
+            errors.append(max(abs(box[0] - truth[0]), abs(box[1] - truth[1])))
+        time.sleep(1 / 30)
+
+    stats = tracker.stats()
+    scope.stop()
+    print(f"[info] Tracker: {stats['tracker_ms']} ms per update at {stats['tracker_fps']} Hz, "
+          f"display {stats['display_fps']} fps")
+    if errors:
+        print(f'[info] Box error: mean {sum(errors) / len(errors):.1f} px, max {max(errors)} px '
+              f'over {len(errors)} frames')
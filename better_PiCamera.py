@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 
-import cv2
-import numpy as np
+import math
 import time
-from picamera2 import Picamera2
-from libcamera import Transform
 import threading
 
+# cv2 and the modules that pull in cv2 or numpy are imported where they are first
+# needed, so the camera can start while they load
+
 class ScopeOverlay:
     def __init__(self, width=640, height=480, fps=30):
         self.width = width
@@ -19,45 +19,80 @@ class ScopeOverlay:
         self.running = False
         self.frame = None
         self.lock = threading.Lock()
+        self.first_frame = threading.Event()
+        self.undistorter = None
+        self.undistort_mode = 'points'
+        self.undistort_crop = None
+        self.enhancer = None
+        self.enhancer_lock = threading.Lock() # Held while the capture thread uses the enhancer
+        self.frame_timestamp = None
+        self.tracker = None
+        self.target_box = None
+        self.holdover_table = None
+        self.sink = None
         
-    def start_camera(self):
-        """Initialize and start the Picamera2"""
+    def start_camera(self, camera=None, timeout=5.0):
+        """Initialize and start the Picamera2, or a stand-in such as SyntheticCamera
+
+        Returns once the first frame has been captured, or False after timeout seconds.
+        """
         self.running = True
-        
-        # Initialize the camera
-        self.picam2 = Picamera2()
+        self.first_frame.clear()
         
         # Configure the camera
-        config = self.picam2.create_video_configuration(
-            main={"size": (self.width, self.height), "format": "BGR888"},
-            controls={"FrameDurationLimits": (int(1/self.fps * 1000000), int(1/self.fps * 1000000))},
-            transform=Transform(vflip=False, hflip=False)
-        )
-        self.picam2.configure(config)
+        config = {
+            "main": {"size": (self.width, self.height), "format": "BGR888"},
+            "controls": {"FrameDurationLimits": (int(1/self.fps * 1000000), int(1/self.fps * 1000000))},
+        }
+        
+        # Initialize the camera, picamera2 is only imported when the real camera is used
+        if camera is None:
+            from picamera2 import Picamera2
+            from libcamera import Transform
+            camera = Picamera2()
+            config["transform"] = Transform(vflip=False, hflip=False)
+        self.picam2 = camera
+        self.picam2.configure(self.picam2.create_video_configuration(**config))
         
         # Start the camera
         self.picam2.start()
         
-        # Small delay to allow camera to initialize
-        time.sleep(0.5)
-        
         # Start the frame capture thread
         self.thread = threading.Thread(target=self._capture_frames)
         self.thread.daemon = True
         self.thread.start()
         
+        # Wait for the camera to deliver instead of sleeping a fixed time
+        return self.wait_until_ready(timeout)
+    
+    def wait_until_ready(self, timeout=None):
+        """Block until the first frame is available"""
+        return self.first_frame.wait(timeout)
+        
     def _capture_frames(self):
         """Continuously capture frames from the camera"""
+        import cv2
+
         while self.running:
             # Capture a frame
             frame = self.picam2.capture_array()
+            timestamp = time.monotonic()
             
             # Convert from RGB to BGR for OpenCV processing
             if frame.shape[2] == 3:  # Make sure it's a color frame
                 frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
             
+            if self.undistorter is not None and self.undistort_mode == 'frame':
+                frame = self.undistorter.undistort_frame(frame, self.undistort_crop)
+            
+            with self.enhancer_lock:
+                if self.enhancer is not None:
+                    frame = self.enhancer.process(frame, (self.crosshair_x, self.crosshair_y))
+            
             with self.lock:
                 self.frame = frame.copy()
+                self.frame_timestamp = timestamp
+            self.first_frame.set()
             
             # Limit frame rate to avoid high CPU usage
             time.sleep(1.0 / self.fps)
@@ -70,49 +105,133 @@ class ScopeOverlay:
         if color:
             self.crosshair_color = color
     
+    def set_undistorter(self, undistorter, mode='points', crop=None):
+        """Correct for lens distortion, see Lens_Calibration.Undistorter
+
+        mode 'frame' remaps every captured frame, mode 'points' only moves the
+        reticle to where the aim point appears in the distorted image.
+        """
+        self.undistorter = undistorter
+        self.undistort_mode = mode
+        self.undistort_crop = crop
+    
+    def set_enhancer(self, enhancer):
+        """Brighten the preview at dusk, see Low_Light.LowLightEnhancer. None turns it off."""
+        # Waits for a frame in progress, so the old enhancer is never closed while in use
+        with self.enhancer_lock:
+            previous = self.enhancer
+            self.enhancer = enhancer
+        if previous is not None:
+            previous.close()
+    
+    def _reticle_points(self, points):
+        """Map ideal pinhole reticle coordinates to display coordinates"""
+        if self.undistorter is None or self.undistort_mode != 'points':
+            return points
+        mapped = self.undistorter.distort_points(points, (self.width, self.height), self.undistort_crop)
+        return [(int(round(x)), int(round(y))) for x, y in mapped]
+    
+    def get_raw_frame(self):
+        """Newest camera frame without overlays and its capture time, the frame must not be modified"""
+        with self.lock:
+            return self.frame, self.frame_timestamp
+    
+    def start_tracker(self, box, rate_hz=10, scale=0.5, method='auto'):
+        """Track the target in box = (x, y, w, h), see Target_Tracker.TargetTracker"""
+        from Target_Tracker import TargetTracker
+
+        self.stop_tracker()
+        self.tracker = TargetTracker(self.get_raw_frame, rate_hz=rate_hz, scale=scale, method=method)
+        self.tracker.select(box)
+        self.tracker.start()
+        return self.tracker
+    
+    def stop_tracker(self):
+        if self.tracker is not None:
+            self.tracker.stop()
+            self.tracker = None
+            self.target_box = None
+    
+    def set_holdover_table(self, table):
+        """Drive the crosshair from sensor_data 'Range' and 'Wind' through a Holdover_Table.HoldoverTable
+
+        The offsets are scaled from the height the table was built for to this overlay's height.
+        """
+        self.holdover_table = table
+    
+    def _apply_holdover(self):
+        """Bilinear table lookup, the only per-frame ballistic work"""
+        from Holdover_Table import parseQuantity, RANGE_TO_METERS, WIND_TO_MPS
+
+        distance = parseQuantity(self.sensor_data.get('Range'), RANGE_TO_METERS, 'm')
+        if distance is None:
+            return
+        crosswind = parseQuantity(self.sensor_data.get('Wind', 0), WIND_TO_MPS, 'm/s') or 0.0
+        x_offset, y_offset = self.holdover_table.lookup(distance, crosswind, self.height)
+        self.update_crosshair(int(round(x_offset)), int(round(y_offset)))
+    
     def update_sensor_data(self, data):
         """Update the sensor data to be displayed"""
         self.sensor_data = data
     
-    def get_frame_with_overlay(self):
-        """Get the current frame with overlays applied"""
+    def get_frame_with_overlay(self, displayed=True):
+        """Get the current frame with overlays applied
+
+        displayed is False for frames that are not shown on the display, such as the
+        stream and saved captures, so they neither count towards the tracker display
+        rate nor update target_box.
+        """
+        import cv2
+
         with self.lock:
             if self.frame is None:
                 return None
             
             # Make a copy to avoid modifying the original
             output = self.frame.copy()
+            timestamp = self.frame_timestamp
+        
+        if self.holdover_table is not None:
+            self._apply_holdover()
         
         # Draw crosshair
         size = 20
         thickness = 2
+        mil_spacing = 10
+        
+        # Crosshair centre, then the mil dots below and to the right of it
+        points = [(self.crosshair_x, self.crosshair_y)]
+        points += [(self.crosshair_x, self.crosshair_y + i * mil_spacing) for i in range(1, 5)]
+        points += [(self.crosshair_x + i * mil_spacing, self.crosshair_y) for i in range(1, 5)]
+        points = self._reticle_points(points)
+        crosshair_x, crosshair_y = points[0]
         
         # Horizontal line
         cv2.line(output, 
-                (self.crosshair_x - size, self.crosshair_y), 
-                (self.crosshair_x + size, self.crosshair_y), 
+                (crosshair_x - size, crosshair_y), 
+                (crosshair_x + size, crosshair_y), 
                 self.crosshair_color, thickness)
         
         # Vertical line
         cv2.line(output, 
-                (self.crosshair_x, self.crosshair_y - size), 
-                (self.crosshair_x, self.crosshair_y + size), 
+                (crosshair_x, crosshair_y - size), 
+                (crosshair_x, crosshair_y + size), 
                 self.crosshair_color, thickness)
         
         # Draw mil dots or rangefinder markings
-        mil_spacing = 10
-        for i in range(1, 5):
-            # Horizontal mil dots below crosshair
-            cv2.line(output,
-                    (self.crosshair_x, self.crosshair_y + i * mil_spacing),
-                    (self.crosshair_x, self.crosshair_y + i * mil_spacing),
-                    self.crosshair_color, thickness - 1)
-                    
-            # Vertical mil dots to the right of crosshair
-            cv2.line(output,
-                    (self.crosshair_x + i * mil_spacing, self.crosshair_y),
-                    (self.crosshair_x + i * mil_spacing, self.crosshair_y),
-                    self.crosshair_color, thickness - 1)
+        for point in points[1:]:
+            cv2.line(output, point, point, self.crosshair_color, thickness - 1)
+        
+        # Draw the tracked target, interpolated to the time this frame was captured
+        tracker = self.tracker
+        if tracker is not None:
+            target_box = tracker.get_box(timestamp)
+            if displayed:
+                self.target_box = target_box
+                tracker.frame_shown()
+            if target_box is not None:
+                x, y, w, h = target_box
+                cv2.rectangle(output, (x, y), (x + w, y + h), (0, 255, 255), 1)
         
         # Draw sensor data
         y_pos = 30
@@ -126,30 +245,58 @@ class ScopeOverlay:
         
         return output
     
-    def display_preview(self):
-        """Show a preview window with the overlay"""
-        cv2.namedWindow("Scope View", cv2.WINDOW_NORMAL)
+    def display_preview(self, sink=None):
+        """Show the overlaid view on a display sink, a preview window by default"""
+        from Display_Sinks import OpenCVWindowSink, KeyReader
+
+        self.sink = sink if sink is not None else OpenCVWindowSink("Scope View")
+        keys = KeyReader()
         
-        while self.running:
-            frame = self.get_frame_with_overlay()
-            if frame is not None:
-                cv2.imshow("Scope View", frame)
-            
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
-                self.stop()
-                break
+        try:
+            while self.running:
+                frame = self.get_frame_with_overlay()
+                if frame is not None:
+                    self.sink.show(frame)
+                else:
+                    time.sleep(0.005)
+                
+                key = self.sink.poll_key() or keys.poll()
+                if key == ord('q'):
+                    self.stop()
+                    break
+        finally:
+            keys.close()
+    
+    def start_stream(self, port=8000, fps=15, quality=80):
+        """Serve the overlaid view as MJPEG over HTTP, see Scope_Stream.py"""
+        from Scope_Stream import StreamServer
+
+        self.stream_server = StreamServer(lambda: self.get_frame_with_overlay(displayed=False), port=port, fps=fps, quality=quality,
+                                          timestamp_source=lambda: self.frame_timestamp)
+        self.stream_server.start()
+        return self.stream_server
     
     def stop(self):
         """Stop the camera and clean up"""
         self.running = False
+        # Let the capture thread finish its frame before closing what it uses
+        if hasattr(self, 'thread') and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+        if hasattr(self, 'stream_server'):
+            self.stream_server.stop()
+        self.set_enhancer(None)
+        self.stop_tracker()
         if hasattr(self, 'picam2'):
             self.picam2.stop()
-        cv2.destroyAllWindows()
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
         
     def save_frame(self, path="scope_capture.jpg"):
         """Save the current frame with overlays to a file"""
-        frame = self.get_frame_with_overlay()
+        import cv2
+
+        frame = self.get_frame_with_overlay(displayed=False)
         if frame is not None:
             cv2.imwrite(path, frame)
             return True
@@ -157,11 +304,25 @@ class ScopeOverlay:
 
 # Example usage
 if __name__ == "__main__":
+    from Startup_Timeline import StartupTimeline
+    timeline = StartupTimeline()
+    
     # Create the scope overlay instance
     scope = ScopeOverlay(width=800, height=600, fps=30)
     
-    # Start the camera
-    scope.start_camera()
+    # Start the camera while OpenCV and the display sinks load
+    def importDisplaySinks():
+        import Display_Sinks
+        return Display_Sinks
+    startup = timeline.parallel(camera=scope.start_camera, display_sinks=importDisplaySinks)
+    if not startup['camera']:
+        scope.stop()
+        raise SystemExit('[FATAL ERROR] The camera delivered no frame within 5 seconds')
+    first_frame = True
+    
+    # 'fb' draws on the console framebuffer instead of a desktop window
+    scope.sink = startup['display_sinks'].createSink('window')
+    keys = startup['display_sinks'].KeyReader()
     
     # Update with mock sensor data (would come from real sensors)
     scope.update_sensor_data({
@@ -177,8 +338,8 @@ if __name__ == "__main__":
         while True:
             # Simulate crosshair adjustments based on external factors
             # In reality, this would use your ballistic calculations
-            wind_offset = int(np.sin(time.time()) * 50)
-            elevation_offset = int(np.cos(time.time() * 0.5) * 25)
+            wind_offset = int(math.sin(time.time()) * 50)
+            elevation_offset = int(math.cos(time.time() * 0.5) * 25)
             
             # Update the crosshair position
             scope.update_crosshair(x_offset=wind_offset, y_offset=elevation_offset)
@@ -186,10 +347,14 @@ if __name__ == "__main__":
             # Display the preview
             frame = scope.get_frame_with_overlay()
             if frame is not None:
-                cv2.imshow("Scope View", frame)
+                scope.sink.show(frame)
+                if first_frame:
+                    timeline.mark('first frame shown')
+                    timeline.report()
+                    first_frame = False
             
             # Handle key presses
-            key = cv2.waitKey(1) & 0xFF
+            key = scope.sink.poll_key() or keys.poll()
             if key == ord('q'):
                 break
             elif key == ord('s'):
@@ -203,5 +368,6 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("Interrupted by user")
     finally:
+        keys.close()
         scope.stop()
         print("Camera stopped")
\ No newline at end of file